@@ -1,45 +1,89 @@
+import sys
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support
-import numpy as np
+import argparse
+
+# pandas, numpy dan matplotlib diimport saat dibutuhkan agar start-up cepat
+
+def iter_dataset(dataset_path):
+    """Baca dataset item per item: JSONL di-stream per baris, JSON list dimuat biasa"""
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        if dataset_path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
 
 class AccuracyTester:
-    def __init__(self):
+    def __init__(self, lang='eng', preprocess=True, workers=None, cache_dir='.ocr_eval_cache'):
         self.results = []
+        self.lang = lang
+        self.preprocess = preprocess
+        self.workers = workers
+        # Output OCR mentah disimpan per (gambar, bahasa, konfigurasi
+        # preprocessing) sehingga run ulang hanya menghitung ulang metrik
+        self.cache_dir = cache_dir
     
-    def test_dataset(self, dataset_path):
-        """Test OCR dengan dataset yang memiliki ground truth"""
-        with open(dataset_path, 'r') as f:
-            dataset = json.load(f)
-        
+    def _ocr_app(self):
         from main import OCRApplication
-        ocr = OCRApplication()
+        from ocr_cache import OCRCache
+        cache = OCRCache(disk_dir=self.cache_dir) if self.cache_dir else None
+        return OCRApplication(cache=cache)
+    
+    def test_dataset(self, dataset_path, plot_path=None, show_plot=False):
+        """Test OCR dengan dataset yang memiliki ground truth (paralel, dengan cache)"""
+        from collections import deque
+        from batch_engine import iter_results
         
-        for item in dataset:
-            image_path = item['image_path']
-            ground_truth = item['text']
-            
-            # Extract text
-            extracted = ocr.extract_text(image_path)
+        ocr = self._ocr_app()
+        items = deque()
+        
+        def image_paths():
+            # Item disimpan sampai hasil OCR-nya (berurutan) kembali
+            for item in iter_dataset(dataset_path):
+                items.append(item)
+                yield item['image_path']
+        
+        self.results = []
+        for records in iter_results(image_paths(), lang=self.lang, workers=self.workers,
+                                    ordered=True, app=ocr, preprocess=self.preprocess):
+            item = items.popleft()
+            extracted = '\n'.join(record['extracted_text'] for record in records)
             
             # Calculate accuracy
-            accuracy = ocr.calculate_accuracy(extracted, ground_truth)
+            accuracy = ocr.calculate_accuracy(extracted, item['text'])
             
             self.results.append({
-                'image': image_path,
-                'ground_truth': ground_truth,
+                'image': item['image_path'],
+                'ground_truth': item['text'],
                 'extracted': extracted,
+                'error': records[0]['error'],
                 **accuracy
             })
         
-        return self.analyze_results()
+        return self.analyze_results(plot_path=plot_path, show_plot=show_plot)
+    
+    def rescore(self, plot_path=None, show_plot=False):
+        """Hitung ulang metrik dari output OCR yang tersimpan, tanpa OCR ulang"""
+        from text_metrics import score_pairs
+        
+        pairs = [(result['extracted'], result['ground_truth']) for result in self.results]
+        for result, accuracy in zip(self.results, score_pairs(pairs)):
+            result.update(accuracy)
+        
+        return self.analyze_results(plot_path=plot_path, show_plot=show_plot)
     
-    def analyze_results(self):
-        """Analisis statistik hasil testing"""
+    def analyze_results(self, plot_path=None, show_plot=False):
+        """Analisis statistik hasil testing
+
+        Plot ditulis ke plot_path (tanpa display) dan/atau ditampilkan
+        jika show_plot=True.
+        """
         if not self.results:
             return None
         
+        import pandas as pd
+        
         df = pd.DataFrame(self.results)
         
         print("=== OCR Accuracy Test Results ===")
@@ -49,15 +93,27 @@ class AccuracyTester:
         print(f"Word Accuracy: {df['word_accuracy'].mean():.2f}%")
         print(f"Similarity Score: {df['similarity_score'].mean():.2f}%")
         print(f"Overall Accuracy: {df['average_accuracy'].mean():.2f}%")
+        print(f"Character Error Rate: {df['cer'].mean():.2f}%")
+        print(f"Word Error Rate: {df['wer'].mean():.2f}%")
         
         # Visualize
-        self.plot_results(df)
+        if plot_path or show_plot:
+            self.plot_results(df, output_path=plot_path, show=show_plot)
         
         return df
     
-    def plot_results(self, df):
-        """Plot hasil akurasi"""
-        fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    def plot_results(self, df, output_path=None, show=False):
+        """Plot hasil akurasi ke file (headless) atau ke layar"""
+        import numpy as np
+        
+        if show:
+            import matplotlib.pyplot as plt
+            fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+        else:
+            # Figure tanpa pyplot tidak membutuhkan display/GUI backend
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=(12, 10))
+            axes = fig.subplots(2, 2)
         
         # Histogram akurasi
         axes[0, 0].hist(df['average_accuracy'], bins=20, alpha=0.7, color='blue')
@@ -87,8 +143,13 @@ class AccuracyTester:
         axes[1, 1].set_title('Cumulative Accuracy Distribution')
         axes[1, 1].grid(True)
         
-        plt.tight_layout()
-        plt.show()
+        fig.tight_layout()
+        if output_path:
+            fig.savefig(output_path)
+            print(f"Plot saved to {output_path}")
+        if show:
+            import matplotlib.pyplot as plt
+            plt.show()
 
 # Contoh dataset JSON
 sample_dataset = [
@@ -102,11 +163,32 @@ sample_dataset = [
     }
 ]
 
-if __name__ == "__main__":
-    tester = AccuracyTester()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR accuracy evaluation")
+    parser.add_argument('dataset', nargs='?', help="dataset .jsonl (streamed) or .json list")
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-preprocess', action='store_true')
+    parser.add_argument('--cache-dir', default='.ocr_eval_cache',
+                        help="raw OCR output cache, '' to disable")
+    parser.add_argument('--plot', default=None, help="write plots to this image file")
+    parser.add_argument('--show', action='store_true', help="show plots in a window")
+    parser.add_argument('--write-sample', action='store_true',
+                        help="write the sample test_dataset.json and exit")
+    args = parser.parse_args(argv)
     
-    # Simpan sample dataset
-    with open('test_dataset.json', 'w') as f:
-        json.dump(sample_dataset, f, indent=2)
+    if args.write_sample or not args.dataset:
+        # Simpan sample dataset
+        with open('test_dataset.json', 'w') as f:
+            json.dump(sample_dataset, f, indent=2)
+        
+        print("Sample dataset created. Please add your test images and update the JSON file.")
+        return 0
     
-    print("Sample dataset created. Please add your test images and update the JSON file.")
\ No newline at end of file
+    tester = AccuracyTester(lang=args.lang, preprocess=not args.no_preprocess,
+                            workers=args.workers, cache_dir=args.cache_dir or None)
+    df = tester.test_dataset(args.dataset, plot_path=args.plot, show_plot=args.show)
+    return 0 if df is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+import os
+import time
+import signal
+import hashlib
+import threading
+from fnmatch import fnmatch
+from collections import deque
+from concurrent.futures import (Future, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+                                FIRST_COMPLETED)
+from datetime import datetime
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.pdf')
+RESULT_FIELDS = ['filename', 'page', 'extracted_text', 'timestamp', 'language', 'error', 'path',
+                 'duplicate_of']
+
+# Thread maksimum untuk hash near-duplicate (decode OpenCV melepas GIL)
+HASH_WORKERS = 4
+
+# Instance OCRApplication milik proses worker (dibuat sekali per proses)
+_worker_app = None
+
+
+def _init_worker(app):
+    """Inisialisasi state OCR per proses worker
+
+    app adalah salinan OCRApplication pemanggil (pickle pada spawn, salinan
+    memori pada fork) sehingga setiap worker memiliki state preprocessing
+    dan cache memorinya sendiri. Pada fork metrics induk ikut tersalin,
+    jadi di-reset agar snapshot worker hanya berisi kerja worker ini.
+    """
+    global _worker_app
+
+    # Ctrl+C ditangani proses utama (membatalkan task dan menutup pool)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Satu thread per proses Tesseract/OpenCV, paralelisme dari jumlah worker
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+
+    app.metrics.reset()
+    _worker_app = app
+
+
+def _make_record(image_path, lang, page=1, text='', error=''):
+    return {
+        'path': image_path,
+        'filename': os.path.basename(image_path),
+        'page': page,
+        'extracted_text': text,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'language': lang,
+        'error': error
+    }
+
+
+def process_file(image_path, lang='eng', app=None, preprocess=True, with_boxes=False):
+    """OCR satu file, error dicatat di hasil tanpa menghentikan batch
+
+    Mengembalikan list record, satu per halaman (TIFF/PDF multi-halaman
+    diproses per halaman secara berurutan di worker ini). with_boxes=True
+    menambahkan WordBoxes per halaman di record['_boxes'].
+    """
+    from page_reader import is_multipage
+
+    app = app or _worker_app
+    try:
+        if not is_multipage(image_path):
+            result = app._recognize(image_path, lang=lang, preprocess=preprocess)
+            records = [_make_record(image_path, lang, text=result.text.strip())]
+            if with_boxes:
+                records[0]['_boxes'] = result.word_boxes
+        else:
+            records = []
+            for page in app.extract_pages(image_path, lang=lang, preprocess=preprocess,
+                                          workers=1, with_boxes=with_boxes):
+                record = _make_record(image_path, lang, page['page'], page['text'],
+                                      page['error'])
+                if page.get('word_boxes') is not None:
+                    record['_boxes'] = page['word_boxes']
+                records.append(record)
+    except Exception as e:
+        app.metrics.record_error('batch', e)
+        records = [_make_record(image_path, lang, error=f"{type(e).__name__}: {e}")]
+
+    # Di proses worker, metrics per file dikirim balik ke proses utama
+    if app is _worker_app and app.metrics.enabled:
+        records[0]['_metrics'] = app.metrics.snapshot()
+        app.metrics.reset()
+    return records
+
+
+def _matches(rel_path, patterns):
+    name = rel_path.rsplit('/', 1)[-1]
+    return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def parse_shard(value):
+    """'i/N' menjadi (i, N) dengan 0 <= i < N"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Format shard harus i/N, bukan {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard {value!r} di luar rentang 0..N-1")
+    return index, count
+
+
+def shard_of(key, count):
+    """Nomor shard deterministik untuk key (sama di semua mesin dan proses)"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+def in_shard(paths, shard, root=None):
+    """Filter lazy: hanya path milik shard (index, count)
+
+    Key shard adalah path relatif terhadap root (format '/'), sehingga
+    node dengan mount point berbeda tetap sepakat pembagiannya.
+    """
+    index, count = shard
+    for path in paths:
+        key = os.path.relpath(path, root) if root else path
+        if shard_of(key.replace(os.sep, '/'), count) == index:
+            yield path
+
+
+def scan_images(root, recursive=True, include=None, exclude=None, extensions=IMAGE_EXTENSIONS):
+    """Generator path gambar di bawah root memakai os.scandir
+
+    Isi setiap folder diurutkan sehingga urutan hasil deterministik, tetapi
+    hanya satu listing folder per level yang ada di memori. include/exclude
+    berupa pola glob yang dicocokkan dengan path relatif ('a/b/c.png') atau
+    nama file; folder yang cocok dengan exclude tidak ditelusuri.
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+
+    def walk(folder, rel_folder):
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Cannot scan {folder}: {e}")
+            return
+
+        subfolders = []
+        for entry in entries:
+            rel_path = f"{rel_folder}/{entry.name}" if rel_folder else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not _matches(rel_path, exclude):
+                    subfolders.append((entry.path, rel_path))
+                continue
+            if not entry.name.lower().endswith(extensions):
+                continue
+            if include and not _matches(rel_path, include):
+                continue
+            if _matches(rel_path, exclude):
+                continue
+            yield entry.path
+
+        for folder_path, rel_path in subfolders:
+            yield from walk(folder_path, rel_path)
+
+    yield from walk(root, '')
+
+
+def list_images(image_folder):
+    """Daftar file gambar dalam folder (tidak rekursif), diurutkan agar deterministik"""
+    return list(scan_images(image_folder, recursive=False))
+
+
+def bounded_map(pool, fn, arg_tuples, max_inflight, ordered=True):
+    """Submit fn(*args) ke pool dengan jumlah task berjalan dibatasi max_inflight
+
+    Yield hasil sesuai urutan input (ordered=True) atau urutan selesai.
+    Input dikonsumsi secara lazy sehingga memori tetap konstan.
+    """
+    args_iter = iter(arg_tuples)
+    pending = deque() if ordered else set()
+
+    def submit_next():
+        for args in args_iter:
+            future = pool.submit(fn, *args)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            return True
+        return False
+
+    for _ in range(max_inflight):
+        if not submit_next():
+            break
+
+    try:
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+
+            for future in done:
+                yield future.result()
+                submit_next()
+    finally:
+        # Generator dihentikan lebih awal (cancel): batalkan task yang belum jalan
+        for future in pending:
+            future.cancel()
+
+
+class InlineExecutor:
+    """Executor tanpa pool: fn dijalankan langsung saat submit"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _copy_records(records, image_path=None):
+    """Salinan record agar hasil gambar asal tidak diubah pemakainya
+    (pop '_metrics'/'_boxes'); dengan image_path, record ditandai sebagai
+    duplikat gambar asalnya dan metrics worker tidak ikut disalin"""
+    copies = []
+    for record in records:
+        copy = dict(record)
+        if image_path is not None:
+            copy.pop('_metrics', None)
+            copy.update(path=image_path, filename=os.path.basename(image_path),
+                        timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        duplicate_of=record['path'])
+        copies.append(copy)
+    return copies
+
+
+def _chain(source, target, transform=None):
+    """Teruskan hasil/exception future source ke future target
+
+    Membatalkan target (mis. batch dihentikan) ikut membatalkan source.
+    """
+    def done(future):
+        if target.done():
+            return
+        if future.cancelled():
+            target.cancel()
+        elif future.exception() is not None:
+            target.set_exception(future.exception())
+        else:
+            result = future.result()
+            target.set_result(transform(result) if transform else result)
+    source.add_done_callback(done)
+    target.add_done_callback(lambda f: f.cancelled() and source.cancel())
+
+
+def _succeeded(future):
+    return (not future.cancelled() and future.exception() is None
+            and not future.result()[0].get('error'))
+
+
+class DedupExecutor:
+    """Pembungkus executor untuk process_file dengan deteksi near-duplicate
+
+    Sebelum submit, pHash gambar dicari di Deduplicator. Gambar yang
+    terkonfirmasi sama dengan gambar yang sudah disubmit tidak di-OCR ulang: future-nya
+    diselesaikan dengan salinan record gambar tersebut (menunggu jika
+    masih diproses). Jika OCR gambar asal gagal, duplikat diproses sendiri.
+    lookup=False selalu meng-OCR gambar (mis. file yang diubah di tempat,
+    yang pasti mirip dengan versi lamanya) tetapi tetap mencatat hash-nya.
+    hash_workers > 0 menghitung hash dan konfirmasi di thread pool sehingga
+    submit() tidak menunggu decode; pencarian dan pencatatan hash tetap
+    mengikuti urutan submit (scan ulang yang tepat menyusul aslinya tetap
+    terdeteksi).
+    """
+
+    def __init__(self, pool, dedup, hash_workers=0):
+        self.pool = pool
+        self.dedup = dedup
+        self._hasher = ThreadPoolExecutor(hash_workers) if hash_workers else None
+        self._registered = threading.Event()
+        self._registered.set()
+
+    def submit(self, fn, image_path, *args, lookup=True):
+        future = Future()
+        previous, self._registered = self._registered, threading.Event()
+        task = (future, fn, image_path, args, lookup, previous, self._registered)
+        if self._hasher is None:
+            self._route(*task)
+        else:
+            self._hasher.submit(self._route, *task)
+        return future
+
+    def shutdown(self, wait=True):
+        """Hentikan thread hash (task yang future-nya dibatalkan selesai tanpa OCR)"""
+        if self._hasher is not None:
+            self._hasher.shutdown(wait)
+
+    def _route(self, future, fn, image_path, args, lookup, previous, registered):
+        """Hash image_path lalu pakai ulang hasil gambar yang sama atau submit OCR
+
+        Hash dihitung paralel; pencarian, konfirmasi dan pencatatan menunggu
+        gambar sebelumnya (previous) selesai dicatat, lalu memberi giliran ke
+        gambar berikutnya (registered).
+        """
+        try:
+            value = None if future.done() else self.dedup.hash_file(image_path)
+            previous.wait()
+            if future.done():
+                return
+            candidates = (self.dedup.candidates(value)
+                          if value is not None and lookup else [])
+            leader = self.dedup.confirm(image_path, candidates) if candidates else None
+            if leader is None:
+                self._start(future, fn, image_path, args, value)
+                return
+            leader.add_done_callback(
+                lambda f: self._reuse(f, future, fn, image_path, args))
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            registered.set()
+
+    def _start(self, future, fn, image_path, args, value):
+        # Future internal menyimpan record asli untuk dipakai ulang; pemanggil
+        # menerima salinan yang boleh diubah (mis. pop '_boxes')
+        try:
+            inner = self.pool.submit(fn, image_path, *args)
+        except RuntimeError as e:
+            # Pool sudah ditutup (batch dibatalkan)
+            if not future.done():
+                future.set_exception(e)
+            return
+        if value is not None:
+            self.dedup.add(inner, value, image_path)
+            inner.add_done_callback(self._forget_failed)
+        _chain(inner, future, _copy_records)
+
+    def _forget_failed(self, future):
+        if not _succeeded(future):
+            self.dedup.remove(future)
+
+    def _reuse(self, leader, future, fn, image_path, args):
+        if future.done():
+            return
+        if leader.cancelled():
+            future.cancel()
+            return
+        if _succeeded(leader):
+            future.set_result(_copy_records(leader.result(), image_path))
+            return
+        try:
+            _chain(self.pool.submit(fn, image_path, *args), future)
+        except RuntimeError as e:
+            # Pool sudah ditutup (batch dibatalkan)
+            future.set_exception(e)
+
+
+def iter_results(image_paths, lang='eng', workers=None, ordered=True, app=None,
+                 preprocess=True, with_boxes=False, dedup=None):
+    """Jalankan OCR di process pool dan yield list record per file
+
+    ordered=True mengikuti urutan input, ordered=False mengikuti urutan selesai.
+    Jumlah task yang sedang berjalan dibatasi agar memori tetap konstan.
+    dedup (dedup.Deduplicator) opsional melewati OCR untuk gambar yang
+    hampir identik dengan gambar sebelumnya (lihat DedupExecutor).
+    """
+    workers = workers or os.cpu_count() or 1
+    if app is None:
+        from main import OCRApplication
+        app = OCRApplication()
+
+    if workers == 1:
+        # Tanpa pool: jalankan langsung di proses ini
+        if dedup is None:
+            for image_path in image_paths:
+                yield process_file(image_path, lang, app, preprocess, with_boxes)
+            return
+        yield from bounded_map(DedupExecutor(InlineExecutor(), dedup), process_file,
+                               ((image_path, lang, app, preprocess, with_boxes)
+                                for image_path in image_paths),
+                               max_inflight=1, ordered=ordered)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(app,)) as pool:
+        executor = pool
+        if dedup is not None:
+            executor = DedupExecutor(pool, dedup, hash_workers=min(workers, HASH_WORKERS))
+        try:
+            yield from bounded_map(executor, process_file,
+                                   ((image_path, lang, None, preprocess, with_boxes)
+                                    for image_path in image_paths),
+                                   max_inflight=workers * 4, ordered=ordered)
+        finally:
+            if executor is not pool:
+                executor.shutdown()
+
+
+class BatchStats:
+    """Statistik throughput batch"""
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+
+    def update(self, record):
+        self.processed += 1
+        if record.get('error'):
+            self.failed += 1
+        if record.get('duplicate_of'):
+            self.duplicates += 1
+        self.elapsed = time.perf_counter() - self.start_time
+
+    @property
+    def images_per_sec(self):
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'ocr_skipped': self.duplicates,
+            'elapsed_sec': round(self.elapsed, 3),
+            'images_per_sec': round(self.images_per_sec, 2)
+        }
+
+    def __str__(self):
+        text = (f"Processed {self.processed} images "
+                f"({self.failed} failed) in {self.elapsed:.1f}s "
+                f"- {self.images_per_sec:.2f} images/sec")
+        if self.duplicates:
+            text += f", {self.duplicates} OCR calls skipped (near-duplicates)"
+        return text
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Kosakata teks sintetis (campuran Indonesia dan Inggris)
+WORDS = (
+    'ini adalah contoh teks untuk pengujian OCR dokumen hasil pemindaian '
+    'the quick brown fox jumps over lazy dog accuracy testing important '
+    'laporan keuangan tahun anggaran nomor tanggal halaman total jumlah '
+    'invoice customer address payment received amount balance due'
+).split()
+
+# Metrik yang dibandingkan dengan baseline: (key, True jika lebih besar lebih baik)
+BASELINE_METRICS = [
+    ('preprocess.p50_ms', False),
+    ('preprocess.p90_ms', False),
+    ('extract_text.p50_ms', False),
+    ('extract_text.p90_ms', False),
+    ('batch.images_per_sec', True),
+    ('accuracy.mean_cer', False),
+    ('accuracy.pairs_per_sec', True),
+]
+
+
+def _load_font(font_path, font_size):
+    if font_path:
+        return ImageFont.truetype(font_path, font_size)
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', font_size)
+    except OSError:
+        return ImageFont.load_default(size=font_size)
+
+
+def generate_document(seed=0, lines=20, words_per_line=8, font_path=None, font_size=28,
+                      skew=0.0, noise=0.0, dpi=300, page_width_in=8.27):
+    """Render satu halaman sintetis; kembalikan (gambar BGR, ground truth)
+
+    skew dalam derajat, noise = standar deviasi noise gaussian (0-255),
+    font_size dalam point pada resolusi dpi.
+    """
+    rng = random.Random(seed)
+    text_lines = [' '.join(rng.choice(WORDS) for _ in range(words_per_line))
+                  for _ in range(lines)]
+
+    font = _load_font(font_path, round(font_size * dpi / 72))
+    margin = dpi // 2
+    line_height = round(font_size * dpi / 72 * 1.6)
+    width = round(page_width_in * dpi)
+    height = margin * 2 + line_height * lines
+
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for i, line in enumerate(text_lines):
+        draw.text((margin, margin + i * line_height), line, fill=0, font=font)
+
+    img = np.asarray(page).copy()
+    if skew:
+        M = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        img = cv2.warpAffine(img, M, (width, height), borderValue=255)
+    if noise:
+        noisy = img.astype(np.float32) + np.random.default_rng(seed).normal(0, noise, img.shape)
+        img = np.clip(noisy, 0, 255).astype(np.uint8)
+
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR), '\n'.join(text_lines)
+
+
+def generate_dataset(out_dir, count=20, seed=0, **params):
+    """Tulis count halaman sintetis + dataset.jsonl (image_path, text) ke out_dir
+
+    Parameter skew dan noise berupa nilai maksimum; setiap halaman
+    mendapat nilai acak di antara 0 dan nilai tersebut.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    max_skew = params.pop('skew', 0.0)
+    max_noise = params.pop('noise', 0.0)
+    dpi = params.get('dpi', 300)
+
+    dataset_path = os.path.join(out_dir, 'dataset.jsonl')
+    with open(dataset_path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            img, text = generate_document(seed=seed + i,
+                                          skew=rng.uniform(-max_skew, max_skew),
+                                          noise=rng.uniform(0, max_noise),
+                                          **params)
+            image_path = os.path.join(out_dir, f"page_{i:04d}.png")
+            Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)).save(image_path, dpi=(dpi, dpi))
+            f.write(json.dumps({'image_path': image_path, 'text': text}, ensure_ascii=False) + '\n')
+    return dataset_path
+
+
+def load_dataset(dataset_path):
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def latency_summary(seconds):
+    """Persentil latency (ms) dari daftar durasi"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {}
+    return {
+        'count': int(ms.size),
+        'mean_ms': round(float(ms.mean()), 2),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p90_ms': round(float(np.percentile(ms, 90)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2)
+    }
+
+
+def peak_rss_mb():
+    """Peak RSS proses ini dan proses anak (Tesseract, worker) dalam MB"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss dalam KB di Linux, byte di macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return {
+        'self_mb': round(own / 2 ** 20, 1),
+        'children_mb': round(children / 2 ** 20, 1)
+    }
+
+
+def _timed(fn, items):
+    durations = []
+    outputs = []
+    for item in items:
+        start = time.perf_counter()
+        outputs.append(fn(item))
+        durations.append(time.perf_counter() - start)
+    return durations, outputs
+
+
+def run_benchmark(dataset_path, lang='eng', workers=None):
+    """Jalankan preprocess_image, extract_text, batch_process dan metrik akurasi"""
+    from main import OCRApplication
+
+    dataset = load_dataset(dataset_path)
+    image_paths = [item['image_path'] for item in dataset]
+    report = {'images': len(dataset), 'lang': lang}
+
+    # Preprocessing saja, dengan rincian per stage
+    app = OCRApplication()
+    durations, _ = _timed(app._preprocess_image, image_paths)
+    report['preprocess'] = latency_summary(durations)
+    report['preprocess']['stages'] = {
+        name: {
+            'runs': total['runs'],
+            'skipped': total['skipped'],
+            'mean_ms': round(total['seconds'] / total['runs'] * 1000, 2)
+        }
+        for name, total in app.pipeline.totals.items()
+    }
+
+    # Latency extract_text end-to-end (tanpa cache)
+    app = OCRApplication()
+    durations, extracted = _timed(lambda path: app._extract_text(path, lang=lang), image_paths)
+    report['extract_text'] = latency_summary(durations)
+
+    # Throughput batch paralel, hanya atas gambar dataset (folder dataset bisa
+    # berisi file lain, mis. output run sebelumnya)
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'images')
+        os.makedirs(input_dir)
+        for i, path in enumerate(image_paths):
+            target = os.path.join(input_dir, f"{i:04d}_{os.path.basename(path)}")
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+        stats = OCRApplication().batch_process(input_dir, os.path.join(tmp, 'results.csv'),
+                                               lang=lang, workers=workers, resume=False)
+    report['batch'] = stats
+
+    # Metrik akurasi
+    pairs = [(text, item['text']) for text, item in zip(extracted, dataset)]
+    start = time.perf_counter()
+    scores = app.calculate_accuracy_batch(pairs)
+    elapsed = time.perf_counter() - start
+    report['accuracy'] = {
+        'mean_cer': round(float(np.mean([s['cer'] for s in scores])), 2),
+        'mean_wer': round(float(np.mean([s['wer'] for s in scores])), 2),
+        'mean_average_accuracy': round(float(np.mean([s['average_accuracy'] for s in scores])), 2),
+        'pairs_per_sec': round(len(pairs) / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+    report['peak_rss'] = peak_rss_mb()
+    return report
+
+
+def _lookup(report, dotted_key):
+    value = report
+    for part in dotted_key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare_with_baseline(report, baseline, tolerance=0.10):
+    """Bandingkan report dengan baseline; kembalikan daftar regresi di atas tolerance"""
+    regressions = []
+    print("\n=== Comparison with baseline ===")
+    for key, higher_is_better in BASELINE_METRICS:
+        current, previous = _lookup(report, key), _lookup(baseline, key)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{key}: {previous} -> {current} ({change:+.1%}){flag}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline OCR benchmark on synthetic documents")
+    parser.add_argument('--out', default='bench_data', help="folder for generated pages")
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--font', default=None, help="path to a .ttf font")
+    parser.add_argument('--font-size', type=int, default=12, help="font size in points")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--skew', type=float, default=3.0, help="max skew in degrees")
+    parser.add_argument('--noise', type=float, default=10.0, help="max gaussian noise sigma")
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--report', default=None, help="write JSON report to this file")
+    parser.add_argument('--save-baseline', default=None, help="store report as baseline")
+    parser.add_argument('--baseline', default=None, help="compare against stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    dataset_path = generate_dataset(args.out, count=args.count, seed=args.seed,
+                                    font_path=args.font, font_size=args.font_size,
+                                    dpi=args.dpi, skew=args.skew, noise=args.noise,
+                                    lines=args.lines)
+    report = run_benchmark(dataset_path, lang=args.lang, workers=args.workers)
+
+    print("\n=== Benchmark Report ===")
+    print(json.dumps(report, indent=2))
+
+    for path in (args.report, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report saved to {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_with_baseline(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
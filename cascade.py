@@ -0,0 +1,126 @@
+import time
+
+from preprocessing import (PreprocessPipeline, Grayscale, Stage, compose_transform,
+                           record_transform)
+from ocr_result import IDENTITY_TRANSFORM
+
+
+class LimitSize(Stage):
+    """Perkecil gambar jika sisi terpanjang melebihi max_dim
+
+    Faktor skala disimpan di context['scale'] agar bounding box hasil OCR
+    dapat dikembalikan ke koordinat asli.
+    """
+
+    name = 'limit'
+
+    def __init__(self, max_dim=2000, enabled=True):
+        super().__init__(enabled)
+        self.max_dim = max_dim
+
+    def apply(self, img, context):
+        import cv2
+        (h, w) = img.shape[:2]
+        scale = self.max_dim / max(h, w)
+        if scale >= 1:
+            return None
+        context['scale'] = scale
+        record_transform(context, [[scale, 0, 0], [0, scale, 0]])
+        return cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def config(self):
+        return str(self.max_dim)
+
+
+class Tier:
+    """Satu tingkat cascade: pipeline preprocessing + konfigurasi Tesseract"""
+
+    def __init__(self, name, pipeline, config=''):
+        self.name = name
+        self.pipeline = pipeline
+        self.config = config
+
+    def signature(self):
+        return f"{self.name}[{self.pipeline.signature()};{self.config}]"
+
+
+def _rescale_boxes(data, scale):
+    for column in ('left', 'top', 'width', 'height'):
+        data[column] = [round(value / scale) for value in data[column]]
+
+
+class Cascade:
+    """OCR bertingkat: tier murah dulu, naik ke tier berikutnya jika
+    rata-rata confidence kata di bawah min_confidence
+
+    Tier yang memakai pipeline sama berbagi hasil preprocessing. Jika tidak
+    ada tier yang lolos, hasil dengan confidence tertinggi dipakai.
+    """
+
+    def __init__(self, tiers, min_confidence=75.0):
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def default(cls, pipeline, min_confidence=75.0, fast_max_dim=None):
+        """fast (grayscale mentah) -> full (pipeline aplikasi) -> full dengan psm 6 dan 4"""
+        fast_stages = [Grayscale()]
+        if fast_max_dim:
+            fast_stages.append(LimitSize(fast_max_dim))
+        return cls([
+            Tier('fast', PreprocessPipeline(fast_stages)),
+            Tier('full', pipeline),
+            Tier('full_psm6', pipeline, '--psm 6'),
+            Tier('full_psm4', pipeline, '--psm 4'),
+        ], min_confidence)
+
+    def signature(self):
+        """Identitas konfigurasi cascade (dipakai sebagai bagian cache key)"""
+        return f"cascade{self.min_confidence}:" + '>'.join(tier.signature() for tier in self.tiers)
+
+    def run(self, app, image, lang='eng', dpi=None, context=None):
+        """Jalankan tier berurutan sampai confidence cukup; kembalikan OCRResult
+
+        result.meta['tier'] berisi nama tier yang dipakai dan
+        meta['tiers_tried'] jumlah tier yang dijalankan. context berisi
+        transform sebelum cascade (mis. normalisasi DPI) yang diteruskan
+        ke setiap tier.
+        """
+        from ocr_result import OCRResult
+
+        metrics = app.metrics
+        prepared = {}
+        best = None
+        tried = 0
+        for tier in self.tiers:
+            tried += 1
+            start = time.perf_counter()
+            key = id(tier.pipeline)
+            if key not in prepared:
+                tier_context = dict(context or {}, dpi=dpi)
+                prepared[key] = (tier.pipeline.run(image, tier_context, metrics=metrics),
+                                 tier_context)
+            img, tier_context = prepared[key]
+
+            with metrics.timer('recognize'):
+                data = app.engine.image_to_data(img, lang=lang, config=tier.config)
+            metrics.incr('images')
+            meta = {'preprocess': True, 'tier': tier.name}
+            transform = tier_context.get('transform')
+            if tier_context.get('scale'):
+                _rescale_boxes(data, tier_context['scale'])
+                scale = 1 / tier_context['scale']
+                transform = compose_transform(transform, [[scale, 0, 0], [0, scale, 0]])
+            meta['transform'] = IDENTITY_TRANSFORM if transform is None else transform
+            result = OCRResult(data, lang=lang, meta=meta)
+            metrics.observe(f"cascade.{tier.name}", time.perf_counter() - start)
+
+            if best is None or result.mean_confidence > best.mean_confidence:
+                best = result
+            if result.words and result.mean_confidence >= self.min_confidence:
+                break
+
+        best.meta['tiers_tried'] = tried
+        metrics.incr(f"cascade.served.{best.meta['tier']}")
+        return best
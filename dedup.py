@@ -0,0 +1,404 @@
+import threading
+from collections import OrderedDict
+
+# Hash dihitung dari grayscale yang diperkecil, diluruskan dan dipotong ke
+# konten. Otsu hanya dipakai untuk geometri (sudut, batas konten): hash dari
+# gambar biner membuat JPEG/noise/rescale berjarak 10-30 bit dari aslinya
+HASH_MAX_DIM = 512
+
+# Jarak Hamming maksimum default (dari 256 bit) untuk kandidat: scan ulang
+# berjarak 4-44 bit, halaman lain >= 90. Hash saja tidak bisa membedakan
+# halaman yang hanya berbeda satu angka (0-6 bit), jadi setiap kandidat
+# dikonfirmasi dengan Deduplicator.same_page()
+DEFAULT_THRESHOLD = 48
+
+# Konfirmasi kandidat: kedua gambar diskalakan sehingga median tinggi
+# karakter CONFIRM_CHAR_HEIGHT piksel, lalu dibandingkan per tile CONFIRM_TILE
+# piksel. Tinta yang tidak punya pasangan dalam radius CONFIRM_TOLERANCE
+# piksel di gambar lain dihitung; satu angka yang berbeda menghasilkan
+# >= 11 piksel, scan/foto ulang umumnya 0-7 (yang lebih tinggi tetap di-OCR)
+CONFIRM_CHAR_HEIGHT = 16
+CONFIRM_MAX_DIM = 4000
+CONFIRM_TILE = 128
+CONFIRM_TOLERANCE = 2
+CONFIRM_MAX_DIFF = 6
+
+# Rentang sudut (derajat) yang dicari saat meluruskan gambar
+MAX_SKEW = 5.0
+
+
+def _projection_variance(ink, angle):
+    import cv2
+    import numpy as np
+
+    (h, w) = ink.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return float(np.var(cv2.warpAffine(ink, M, (w, h)).sum(axis=1)))
+
+
+def skew_angle(ink, refine=False):
+    """Sudut rotasi (derajat) yang membuat baris teks mendatar
+
+    Dicari dari variansi profil proyeksi horizontal (maksimum saat baris
+    teks lurus): kasar pada ukuran HASH_MAX_DIM, lalu jika refine=True
+    diperhalus pada setengah resolusi ink. Lebih presisi daripada
+    minAreaRect untuk teks rata kiri dengan panjang baris berbeda.
+    """
+    import cv2
+    import numpy as np
+
+    def best(img, center, span, step):
+        angles = np.arange(center - span, center + span + step / 2, step)
+        return max(angles, key=lambda angle: _projection_variance(img, angle))
+
+    scale = min(1.0, HASH_MAX_DIM / max(ink.shape))
+    small = cv2.resize(ink, None, fx=scale, fy=scale,
+                       interpolation=cv2.INTER_AREA).astype(np.float32)
+    angle = best(small, best(small, 0.0, MAX_SKEW, 0.5), 0.5, 0.1)
+    if refine and scale < 0.5:
+        half = cv2.resize(ink, None, fx=0.5, fy=0.5,
+                          interpolation=cv2.INTER_AREA).astype(np.float32)
+        angle = best(half, angle, 0.15, 0.03)
+    return float(angle)
+
+
+def normalize_page(gray, scale=1.0, refine=False):
+    """Skala, luruskan dan potong gray ke konten: (grayscale, tinta)
+
+    Tinta adalah hasil Otsu (teks bernilai 255). Batas konten diambil dari
+    persentil posisi tinta sehingga bintik noise di tepi tidak menggeser
+    potongan. ValueError jika gambar tidak berisi tinta.
+    """
+    import cv2
+    import numpy as np
+
+    if scale != 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                          interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+    level, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    angle = skew_angle(ink, refine)
+    if abs(angle) >= 0.03:
+        (h, w) = gray.shape
+        M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        gray = cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+        ink = cv2.threshold(gray, level, 255, cv2.THRESH_BINARY_INV)[1]
+
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 10:
+        raise ValueError("Gambar tidak berisi konten")
+    y0, y1 = np.percentile(ys, [0.1, 99.9]).astype(int)
+    x0, x1 = np.percentile(xs, [0.1, 99.9]).astype(int)
+    return gray[y0:y1 + 1, x0:x1 + 1], ink[y0:y1 + 1, x0:x1 + 1]
+
+
+def page_ink(gray):
+    """Tinta halaman pada skala konfirmasi (tinggi karakter CONFIRM_CHAR_HEIGHT)"""
+    import cv2
+    import numpy as np
+
+    ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    stats = cv2.connectedComponentsWithStats(ink, connectivity=8)[2]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    heights = heights[heights > 2]
+    if not len(heights):
+        raise ValueError("Gambar tidak berisi teks")
+    scale = min(CONFIRM_CHAR_HEIGHT / float(np.median(heights)),
+                CONFIRM_MAX_DIM / max(gray.shape))
+    return normalize_page(gray, scale, refine=True)[1]
+
+
+def ink_difference(a, b, tile=CONFIRM_TILE, tolerance=CONFIRM_TOLERANCE):
+    """Jumlah piksel tinta tanpa pasangan terbanyak dalam satu tile
+
+    a dan b adalah hasil page_ink(); b diskalakan ke ukuran a. Setiap tile a
+    dicocokkan ke b (template matching) di sekitar pergeseran tile
+    sebelumnya, sehingga sisa rotasi/skala dari scan ulang tidak terhitung
+    sebagai perbedaan. Tinta a yang tidak ada di b dalam radius tolerance
+    piksel (dan sebaliknya) dihitung per tile.
+    """
+    import cv2
+    import numpy as np
+
+    (h, w) = a.shape
+    b = cv2.resize(b, (w, h), interpolation=cv2.INTER_LINEAR)
+    b = cv2.threshold(b, 127, 255, cv2.THRESH_BINARY)[1]
+    search = tile // 8
+    border = search * 6
+    b = cv2.copyMakeBorder(b, border, border, border, border, cv2.BORDER_CONSTANT, value=0)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * tolerance + 1,) * 2)
+    grown_a, grown_b = cv2.dilate(a, kernel), cv2.dilate(b, kernel)
+    smooth_a = cv2.GaussianBlur(a, (0, 0), 2).astype(np.float32)
+    smooth_b = cv2.GaussianBlur(b, (0, 0), 2).astype(np.float32)
+
+    def unmatched(y, x, dx, dy):
+        ta = a[y:y + tile, x:x + tile]
+        (th, tw) = ta.shape
+        y0, x0 = border + y + dy, border + x + dx
+        tb = b[y0:y0 + th, x0:x0 + tw]
+        missing = cv2.subtract(ta, grown_b[y0:y0 + th, x0:x0 + tw])
+        extra = cv2.subtract(tb, grown_a[y:y + th, x:x + tw])
+        return cv2.countNonZero(cv2.bitwise_or(missing, extra))
+
+    worst = 0
+    column_shift = {}
+    for y in range(0, h, tile):
+        shift = None
+        for x in range(0, w, tile):
+            px, py = column_shift.get(x, shift or (0, 0))
+            ta = smooth_a[y:y + tile, x:x + tile]
+            candidates = [(px, py)]
+            if a[y:y + tile, x:x + tile].any():
+                # Tile pertama berisi tinta dicari lebih luas (batas konten
+                # kedua gambar bisa bergeser), tile berikutnya di sekitar tetangga
+                span = search if column_shift else border - 1
+                px = max(span - border, min(border - span, px))
+                py = max(span - border, min(border - span, py))
+                (th, tw) = ta.shape
+                y0, x0 = border + y + py - span, border + x + px - span
+                scores = cv2.matchTemplate(smooth_b[y0:y0 + th + 2 * span, x0:x0 + tw + 2 * span],
+                                           ta, cv2.TM_CCOEFF_NORMED)
+                dx, dy = cv2.minMaxLoc(scores)[3]
+                candidates = [(px, py), (px + dx - span, py + dy - span)]
+            count, dx, dy = min((unmatched(y, x, dx, dy), dx, dy) for dx, dy in candidates)
+            if a[y:y + tile, x:x + tile].any():
+                column_shift[x] = shift = (dx, dy)
+            worst = max(worst, count)
+    return worst
+
+
+def phash(gray, hash_size=16, factor=4):
+    """Perceptual hash (DCT) hash_size * hash_size bit dalam bentuk bytes
+
+    Gambar diperkecil ke (hash_size * factor)^2, lalu setiap koefisien DCT
+    frekuensi rendah dibandingkan dengan median-nya. Tahan terhadap noise,
+    kompresi, kecerahan dan pergeseran kecil.
+    """
+    import cv2
+    import numpy as np
+
+    size = hash_size * factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coeffs = cv2.dct(small)[:hash_size, :hash_size].flatten()
+    return np.packbits(coeffs > np.median(coeffs[1:])).tobytes()
+
+
+def hamming(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).bit_count()
+
+
+_popcount_table = None
+
+
+def _popcount_rows(words):
+    """Jumlah bit 1 per baris matriks uint64"""
+    global _popcount_table
+    import numpy as np
+
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    # numpy < 2.0: tabel popcount per byte
+    if _popcount_table is None:
+        _popcount_table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    return _popcount_table[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class HashIndex:
+    """Index hash untuk pencarian jarak Hamming terdekat (<= threshold)
+
+    Hash disimpan sebagai matriks uint64 (satu baris per entry); pencarian
+    adalah XOR + popcount vektor atas seluruh matriks; scan vektor 100 ribu
+    entry hanya butuh beberapa milidetik, sehingga threshold bebas dipilih
+    tanpa skema band/multi-index.
+    Setelah max_entries, entry terlama ditimpa (ring buffer).
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, bits=256, max_entries=100000):
+        import numpy as np
+
+        if not 0 <= threshold < bits or bits % 64:
+            raise ValueError("bits harus kelipatan 64 dan threshold di antara 0 dan bits")
+        self.threshold = threshold
+        self.bits = bits
+        self.max_entries = max_entries
+        self._hashes = np.zeros((min(1024, max_entries), bits // 64), dtype=np.uint64)
+        self._valid = np.zeros(len(self._hashes), dtype=bool)
+        self._keys = []
+        self._slots = {}
+        self._next = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _row(self, value):
+        import numpy as np
+        if len(value) * 8 != self.bits:
+            raise ValueError(f"Hash harus {self.bits} bit")
+        return np.frombuffer(value, dtype=np.uint64)
+
+    def distances(self, value):
+        """Jarak Hamming value ke setiap slot (slot kosong bernilai bits + 1)"""
+        count = len(self._keys)
+        dist = _popcount_rows(self._hashes[:count] ^ self._row(value))
+        dist[~self._valid[:count]] = self.bits + 1
+        return dist
+
+    def find(self, value):
+        """(key, jarak) entry terdekat dengan jarak <= threshold, None jika tidak ada"""
+        found = self.candidates(value, limit=1)
+        return found[0] if found else None
+
+    def candidates(self, value, limit=4):
+        """Hingga limit (key, jarak) dengan jarak <= threshold, terdekat dulu"""
+        import numpy as np
+
+        if not self._keys:
+            return []
+        dist = self.distances(value)
+        slots = np.flatnonzero(dist <= self.threshold)
+        slots = slots[np.argsort(dist[slots], kind='stable')[:limit]]
+        return [(self._keys[slot], int(dist[slot])) for slot in slots]
+
+    def add(self, key, value):
+        """Simpan hash key; mengembalikan key lama yang ditimpa (ring buffer) atau None"""
+        import numpy as np
+
+        evicted = None
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self._keys) < self.max_entries:
+                slot = len(self._keys)
+                self._keys.append(key)
+                if slot >= len(self._hashes):
+                    grow = min(len(self._hashes) * 2, self.max_entries)
+                    self._hashes = np.resize(self._hashes, (grow, self._hashes.shape[1]))
+                    self._valid = np.resize(self._valid, grow)
+            else:
+                # Penuh: timpa entry terlama
+                slot = self._next % self.max_entries
+                self._next += 1
+                evicted = self._keys[slot]
+                self._slots.pop(evicted, None)
+                self._keys[slot] = key
+            self._slots[key] = slot
+        self._hashes[slot] = self._row(value)
+        self._valid[slot] = True
+        return evicted
+
+    def remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._valid[slot] = False
+
+
+class Deduplicator:
+    """Deteksi gambar hampir identik (scan/foto ulang) sebelum OCR
+
+    hash_file() menghitung pHash dari grayscale yang dinormalisasi (decode
+    diperkecil, diluruskan, dipotong ke konten); match() mencari gambar yang
+    sudah diproses dengan jarak Hamming <= threshold, lalu mengonfirmasi
+    kandidat dengan same_page() sehingga hasil OCR-nya dapat dipakai ulang.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, hash_size=16, max_entries=10000,
+                 max_diff=CONFIRM_MAX_DIFF, ink_cache=8):
+        self.hash_size = hash_size
+        self.max_diff = max_diff
+        self.index = HashIndex(threshold, bits=hash_size * hash_size, max_entries=max_entries)
+        self._paths = {}
+        self._ink = OrderedDict()
+        self._ink_cache = ink_cache
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+
+    @property
+    def threshold(self):
+        return self.index.threshold
+
+    def hash_image(self, gray):
+        scale = min(1.0, HASH_MAX_DIM / max(gray.shape))
+        return phash(normalize_page(gray, scale)[0], self.hash_size)
+
+    def hash_file(self, image_path):
+        """pHash file gambar satu halaman, None jika multi-halaman atau tidak terbaca"""
+        from page_reader import is_multipage
+        from image_handle import ImageHandle
+
+        if is_multipage(image_path):
+            return None
+        try:
+            # Hash hanya butuh resolusi rendah: JPEG di-decode pada 1/2 resolusi,
+            # gambar kecil di-decode ulang pada resolusi penuh
+            gray = ImageHandle(image_path, grayscale=True, reduce=2).array
+            if max(gray.shape) < HASH_MAX_DIM:
+                gray = ImageHandle(image_path, grayscale=True).array
+            return self.hash_image(gray)
+        except Exception:
+            # Gambar rusak/degenerate (mis. 1 piksel) tidak di-dedup, cukup di-OCR
+            return None
+
+    def _page_ink(self, image_path):
+        from image_handle import ImageHandle
+
+        with self._lock:
+            ink = self._ink.get(image_path)
+            if ink is not None:
+                self._ink.move_to_end(image_path)
+                return ink
+        ink = page_ink(ImageHandle(image_path, grayscale=True).array)
+        with self._lock:
+            self._ink[image_path] = ink
+            while len(self._ink) > self._ink_cache:
+                self._ink.popitem(last=False)
+        return ink
+
+    def same_page(self, image_path, other_path):
+        """True jika kedua gambar berisi halaman yang sama (lihat ink_difference)"""
+        try:
+            diff = ink_difference(self._page_ink(other_path), self._page_ink(image_path))
+        except Exception:
+            return False
+        return diff <= self.max_diff
+
+    def candidates(self, value):
+        """[(key, path)] gambar tercatat dengan jarak hash <= threshold, terdekat dulu"""
+        with self._lock:
+            self.lookups += 1
+            return [(key, self._paths[key]) for key, _ in self.index.candidates(value)]
+
+    def confirm(self, image_path, candidates):
+        """Key kandidat pertama yang terkonfirmasi sama dengan image_path, atau None"""
+        for key, path in candidates:
+            if self.same_page(image_path, path):
+                with self._lock:
+                    self.hits += 1
+                return key
+        if candidates:
+            with self._lock:
+                self.rejected += 1
+        return None
+
+    def match(self, value, image_path):
+        """Key gambar yang terkonfirmasi sama dengan image_path, None jika tidak ada"""
+        return self.confirm(image_path, self.candidates(value))
+
+    def add(self, key, value, image_path):
+        with self._lock:
+            self._paths.pop(self.index.add(key, value), None)
+            self._paths[key] = image_path
+
+    def remove(self, key):
+        with self._lock:
+            self.index.remove(key)
+            self._paths.pop(key, None)
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'duplicates': self.hits,
+            'rejected': self.rejected,
+            'threshold': self.threshold,
+            'entries': len(self.index)
+        }
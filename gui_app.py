@@ -2,10 +2,12 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 import tkinter.ttk as ttk
 from PIL import Image, ImageTk
-import cv2
 import pytesseract
-from datetime import datetime
-import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from main import OCRApplication
+from batch_engine import list_images, iter_results, BatchStats
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
@@ -16,9 +18,29 @@ class OCRGUI:
         self.root.geometry("1200x700")
         
         self.image_path = None
+        self.image_handle = None
         self.current_image = None
+        self.ocr = OCRApplication()
+        
+        # OCR berjalan di background; hasil dikirim ke thread UI lewat queue
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.ui_queue = queue.Queue()
         
         self.setup_ui()
+        self.root.after(100, self.poll_ui_queue)
+        
+    def poll_ui_queue(self):
+        """Jalankan callback dari thread worker di thread UI"""
+        try:
+            while True:
+                callback, args = self.ui_queue.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_ui_queue)
+        
+    def run_in_ui(self, callback, *args):
+        self.ui_queue.put((callback, args))
         
     def setup_ui(self):
         # Frame untuk kontrol
@@ -106,12 +128,12 @@ class OCRGUI:
             
     def display_image(self, image_path):
         try:
-            # Baca dan resize gambar
-            img = Image.open(image_path)
-            img.thumbnail((600, 400))  # Resize untuk preview
+            # Decode sekali; handle yang sama dipakai ulang untuk OCR
+            self.image_handle = self.ocr.open_image(image_path, grayscale=False)
+            preview = self.image_handle.thumbnail(600, 400)  # Resize untuk preview
             
             # Convert ke PhotoImage
-            self.current_image = ImageTk.PhotoImage(img)
+            self.current_image = ImageTk.PhotoImage(Image.fromarray(preview))
             self.image_label.config(image=self.current_image)
             
         except Exception as e:
@@ -122,45 +144,41 @@ class OCRGUI:
             messagebox.showwarning("Warning", "Please select an image first!")
             return
         
+        # Ekstrak teks di background dengan pipeline yang sama dengan main.py
+        lang = self.lang_var.get()
+        self.stats_label.config(text="Processing...")
+        future = self.executor.submit(self.ocr._extract_text, self.image_path, lang=lang,
+                                      preprocess=self.preprocess_var.get(),
+                                      handle=self.image_handle)
+        future.add_done_callback(lambda f: self.run_in_ui(self.show_extracted_text, f, lang))
+        
+    def show_extracted_text(self, future, lang):
         try:
-            # Baca gambar
-            img = cv2.imread(self.image_path)
-            if self.preprocess_var.get():
-                # Preprocessing
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                img = thresh
-            
-            # Konversi ke PIL Image
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(img_rgb)
-            
-            # Ekstrak teks
-            lang = self.lang_var.get()
-            text = pytesseract.image_to_string(pil_img, lang=lang)
-            
-            # Tampilkan teks
-            self.text_area.delete(1.0, tk.END)
-            self.text_area.insert(1.0, text)
-            
-            # Hitung statistik
-            char_count = len(text)
-            word_count = len(text.split())
-            line_count = len(text.split('\n'))
-            
-            stats_text = (f"Characters: {char_count} | "
-                         f"Words: {word_count} | "
-                         f"Lines: {line_count} | "
-                         f"Language: {lang}")
-            
-            self.stats_label.config(text=stats_text)
-            
-            # Tawarkan untuk save
-            if text.strip():
-                self.ask_save_text(text)
-                
+            text = future.result()
         except Exception as e:
+            self.stats_label.config(text="Statistics: Not processed")
             messagebox.showerror("Error", f"OCR processing failed: {e}")
+            return
+        
+        # Tampilkan teks
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.insert(1.0, text)
+        
+        # Hitung statistik
+        char_count = len(text)
+        word_count = len(text.split())
+        line_count = len(text.split('\n'))
+        
+        stats_text = (f"Characters: {char_count} | "
+                     f"Words: {word_count} | "
+                     f"Lines: {line_count} | "
+                     f"Language: {lang}")
+        
+        self.stats_label.config(text=stats_text)
+        
+        # Tawarkan untuk save
+        if text.strip():
+            self.ask_save_text(text)
             
     def ask_save_text(self, text):
         save = messagebox.askyesno("Save", "Save extracted text to file?")
@@ -177,51 +195,109 @@ class OCRGUI:
     def batch_process(self):
         folder = filedialog.askdirectory(title="Select folder with images")
         if folder:
-            results = []
-            for filename in os.listdir(folder):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    image_path = os.path.join(folder, filename)
-                    
-                    try:
-                        img = Image.open(image_path)
-                        text = pytesseract.image_to_string(img, lang=self.lang_var.get())
-                        
-                        results.append({
-                            'File': filename,
-                            'Text': text[:100] + '...' if len(text) > 100 else text
-                        })
-                        
-                    except Exception as e:
-                        results.append({
-                            'File': filename,
-                            'Text': f'ERROR: {str(e)}'
-                        })
+            image_paths = list_images(folder)
+            view = self.show_batch_results(len(image_paths))
             
-            # Tampilkan hasil di window baru
-            self.show_batch_results(results)
+            threading.Thread(target=self.run_batch,
+                             args=(image_paths, self.lang_var.get(),
+                                   self.preprocess_var.get(), view),
+                             daemon=True).start()
             
-    def show_batch_results(self, results):
+    def run_batch(self, image_paths, lang, preprocess, view):
+        """Thread background: OCR paralel, setiap hasil dikirim ke UI begitu selesai"""
+        stats = BatchStats()
+        results = iter_results(image_paths, lang=lang, ordered=False, app=self.ocr,
+                               preprocess=preprocess)
+        try:
+            for records in results:
+                if view['cancel'].is_set():
+                    break
+                for record in records:
+                    stats.update(record)
+                self.run_in_ui(self.add_batch_results, view, records, str(stats))
+        except Exception as e:
+            self.run_in_ui(messagebox.showerror, "Error", f"Batch processing failed: {e}")
+        finally:
+            results.close()
+            self.run_in_ui(self.finish_batch, view, str(stats))
+            
+    def show_batch_results(self, total):
         result_window = tk.Toplevel(self.root)
         result_window.title("Batch Processing Results")
         result_window.geometry("800x600")
         
+        view = {
+            'window': result_window,
+            'cancel': threading.Event(),
+            'total': total,
+            'done': 0
+        }
+        
+        # Progress, throughput dan tombol cancel
+        status_frame = tk.Frame(result_window)
+        status_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        view['progress'] = ttk.Progressbar(status_frame, maximum=max(total, 1),
+                                           mode='determinate')
+        view['progress'].pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        view['cancel_button'] = tk.Button(status_frame, text="Cancel",
+                                          command=view['cancel'].set)
+        view['cancel_button'].pack(side=tk.RIGHT, padx=5)
+        
+        view['status'] = tk.Label(result_window, text=f"0 / {total} files")
+        view['status'].pack(fill=tk.X)
+        
         # Treeview untuk hasil
         tree = ttk.Treeview(result_window, columns=('File', 'Text'), show='headings')
         tree.heading('File', text='Filename')
         tree.heading('Text', text='Extracted Text (first 100 chars)')
-        
-        for result in results:
-            tree.insert('', 'end', values=(result['File'], result['Text']))
-        
         tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        view['tree'] = tree
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(tree, orient="vertical", command=tree.yview)
         tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side='right', fill='y')
         
+        # Menutup window juga menghentikan batch
+        def on_close():
+            view['cancel'].set()
+            result_window.destroy()
+        result_window.protocol("WM_DELETE_WINDOW", on_close)
+        
+        return view
+        
+    def add_batch_results(self, view, records, stats_text):
+        if not view['window'].winfo_exists():
+            return
+        
+        for record in records:
+            filename = record['filename']
+            if len(records) > 1:
+                filename += f" [page {record['page']}]"
+            if record['error']:
+                text = f"ERROR: {record['error']}"
+            else:
+                text = record['extracted_text']
+                text = text[:100] + '...' if len(text) > 100 else text
+            view['tree'].insert('', 'end', values=(filename, text))
+        
+        view['done'] += 1
+        view['progress']['value'] = view['done']
+        view['status'].config(text=f"{view['done']} / {view['total']} files | {stats_text}")
+        
+    def finish_batch(self, view, stats_text):
+        if not view['window'].winfo_exists():
+            return
+        
+        state = "Cancelled" if view['cancel'].is_set() else "Done"
+        view['status'].config(text=f"{state}: {view['done']} / {view['total']} files | {stats_text}")
+        view['cancel_button'].config(state=tk.DISABLED)
+        
     def clear_all(self):
         self.image_path = None
+        self.image_handle = None
         self.image_label.config(image='')
         self.text_area.delete(1.0, tk.END)
         self.stats_label.config(text="Statistics: Not processed")
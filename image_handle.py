@@ -0,0 +1,147 @@
+import io
+import os
+import cv2
+import numpy as np
+
+from preprocessing import RescaleDPI
+
+# Flag decode resolusi rendah bawaan OpenCV (decoder JPEG melakukan skala
+# langsung saat decode, format lain diperkecil setelah decode)
+_REDUCED_FLAGS = {
+    (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+    (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def header_dpi(source):
+    """DPI dari header file (path atau bytes) tanpa decode piksel; None jika tidak ada"""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray))
+                        else source) as img:
+            dpi = img.info.get('dpi')
+    except Exception:
+        return None
+    if dpi and dpi[0] and dpi[0] > 1:
+        return float(round(dpi[0]))
+    return None
+
+
+def reduce_factor(dpi, target_dpi):
+    """Faktor IMREAD_REDUCED terbesar (1, 2, 4, 8) yang tidak turun di bawah target_dpi"""
+    factor = 1
+    if dpi and target_dpi:
+        while factor < 8 and dpi / (factor * 2) >= target_dpi:
+            factor *= 2
+    return factor
+
+
+class ImageHandle:
+    """Gambar yang di-decode satu kali dan dibagikan ke semua konsumen
+
+    source berupa path, bytes file atau numpy array. Decode dilakukan
+    saat array pertama kali diakses. gray/bgr/rgb mengembalikan array
+    yang sama (atau view) tanpa salinan bila format sudah sesuai; konversi
+    warna hanya dilakukan sekali lalu disimpan.
+    """
+
+    def __init__(self, source, grayscale=False, reduce=1, dpi=None):
+        if reduce not in (1, 2, 4, 8):
+            raise ValueError("reduce harus 1, 2, 4 atau 8")
+        self.source = source
+        self.grayscale = grayscale
+        self.reduce = reduce
+        self._dpi = dpi
+        self._array = source if isinstance(source, np.ndarray) else None
+        self._gray = None
+        self._bgr = None
+
+    @classmethod
+    def open(cls, source, grayscale=False, target_dpi=None):
+        """Buat handle; jika DPI header jauh di atas target_dpi, decode langsung
+        pada resolusi yang diperkecil (IMREAD_REDUCED_*)"""
+        dpi = None if isinstance(source, np.ndarray) else header_dpi(source)
+        return cls(source, grayscale=grayscale, reduce=reduce_factor(dpi, target_dpi), dpi=dpi)
+
+    @property
+    def path(self):
+        return self.source if isinstance(self.source, (str, os.PathLike)) else None
+
+    @property
+    def dpi(self):
+        """DPI efektif array yang sudah di-decode (memperhitungkan faktor reduce)"""
+        return self._dpi / self.reduce if self._dpi else None
+
+    def _decode(self):
+        if self.reduce > 1:
+            flags = _REDUCED_FLAGS[(self.reduce, self.grayscale)]
+        else:
+            flags = cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR
+        if isinstance(self.source, (bytes, bytearray, memoryview)):
+            img = cv2.imdecode(np.frombuffer(self.source, np.uint8), flags)
+        else:
+            img = cv2.imread(os.fspath(self.source), flags)
+        if img is None:
+            raise ValueError("Gambar tidak dapat dibaca")
+        return img
+
+    @property
+    def decoded(self):
+        return self._array is not None
+
+    @property
+    def array(self):
+        """Array hasil decode (grayscale 2D atau BGR), di-decode sekali"""
+        if self._array is None:
+            self._array = self._decode()
+        return self._array
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def gray(self):
+        """Array grayscale; tanpa salinan jika hasil decode sudah grayscale"""
+        img = self.array
+        if img.ndim == 2:
+            return img
+        if self._gray is None:
+            self._gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def bgr(self):
+        """Array BGR (konvensi cv2)"""
+        img = self.array
+        if img.ndim == 3:
+            return img
+        if self._bgr is None:
+            self._bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return self._bgr
+
+    @property
+    def rgb(self):
+        """View RGB dari array BGR (urutan channel dibalik tanpa salinan)"""
+        img = self.array
+        return img if img.ndim == 2 else img[:, :, ::-1]
+
+    def at_dpi(self, target_dpi, tolerance=0.05):
+        """Array yang diskalakan ke target_dpi; array asli jika DPI tidak diketahui
+        atau sudah dalam toleransi"""
+        out = RescaleDPI(target_dpi, tolerance=tolerance).apply(self.array, {'dpi': self.dpi})
+        return self.array if out is None else out
+
+    def thumbnail(self, max_width, max_height):
+        """Array RGB yang diperkecil untuk preview (mempertahankan rasio)"""
+        (h, w) = self.array.shape[:2]
+        scale = min(max_width / w, max_height / h, 1.0)
+        img = self.rgb
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                             interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(img)
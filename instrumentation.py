@@ -0,0 +1,165 @@
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+# Context manager kosong yang dipakai ulang saat metrics nonaktif
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Timer, counter dan error per tahap hot-path OCR
+
+    Saat enabled=False semua method langsung kembali (timer() memberi
+    context manager kosong yang sama), sehingga overhead dapat diabaikan.
+    Hook dipanggil sebagai hook(kind, name, value) dengan kind
+    'timer', 'counter' atau 'error'.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._hooks = []
+        self._setup()
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.errors = {}
+
+    # Lock dan hook tidak ikut ke proses worker
+    def __getstate__(self):
+        return {'enabled': self.enabled}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._hooks = []
+        self._setup()
+
+    def add_hook(self, hook):
+        """Daftarkan callback hook(kind, name, value)"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _emit(self, kind, name, value):
+        for hook in self._hooks:
+            hook(kind, name, value)
+
+    def timer(self, name):
+        """Context manager untuk mengukur durasi satu tahap"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        """Catat satu durasi (detik) untuk tahap name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = {'count': 0, 'total': 0.0,
+                                             'min': seconds, 'max': seconds}
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['min'] = min(timer['min'], seconds)
+            timer['max'] = max(timer['max'], seconds)
+        if self._hooks:
+            self._emit('timer', name, seconds)
+
+    def incr(self, name, value=1):
+        """Tambah counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self._hooks:
+            self._emit('counter', name, value)
+
+    def record_error(self, stage, exc):
+        """Hitung error per tahap dan tipe exception"""
+        if not self.enabled:
+            return
+        key = (stage, type(exc).__name__)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if self._hooks:
+            self._emit('error', stage, exc)
+
+    def snapshot(self):
+        """Ringkasan metrics dalam bentuk dict"""
+        with self._lock:
+            return {
+                'timers': {
+                    name: dict(timer, mean=timer['total'] / timer['count'])
+                    for name, timer in self.timers.items()
+                },
+                'counters': dict(self.counters),
+                'errors': [
+                    {'stage': stage, 'type': type_name, 'count': count}
+                    for (stage, type_name), count in self.errors.items()
+                ]
+            }
+
+    def merge(self, snapshot):
+        """Gabungkan snapshot dari proses lain (mis. batch worker)"""
+        if not self.enabled or not snapshot:
+            return
+        with self._lock:
+            for name, other in snapshot['timers'].items():
+                timer = self.timers.get(name)
+                if timer is None:
+                    self.timers[name] = {key: other[key] for key in ('count', 'total', 'min', 'max')}
+                    continue
+                timer['count'] += other['count']
+                timer['total'] += other['total']
+                timer['min'] = min(timer['min'], other['min'])
+                timer['max'] = max(timer['max'], other['max'])
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for error in snapshot['errors']:
+                key = (error['stage'], error['type'])
+                self.errors[key] = self.errors.get(key, 0) + error['count']
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+            self.errors = {}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix='ocr'):
+        """Snapshot dalam format teks Prometheus"""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for name, timer in sorted(snapshot['timers'].items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {timer["total"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {timer["count"]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for error in snapshot['errors']:
+            lines.append(f'{prefix}_errors_total{{stage="{error["stage"]}",'
+                         f'type="{error["type"]}"}} {error["count"]}')
+        return '\n'.join(lines) + '\n'
@@ -1,203 +1,516 @@
+import time
+_START = time.perf_counter()
+
 import os
 import sys
-import cv2
-import pytesseract
-import numpy as np
-from PIL import Image
-import pandas as pd
+import json
+import argparse
+from collections import OrderedDict
 from datetime import datetime
-import matplotlib.pyplot as plt
+from tesseract_engine import TesseractEngine
+from ocr_result import OCRResult, IDENTITY_TRANSFORM
+from instrumentation import Metrics
+
+# Modul berat (cv2, numpy, pandas, matplotlib, PIL) diimport di dalam
+# fungsi yang membutuhkannya agar CLI tetap cepat saat start.
+STARTUP_BUDGET_MS = 150
+HEAVY_MODULES = ('cv2', 'numpy', 'pandas', 'matplotlib', 'PIL', 'pytesseract')
 
 # Konfigurasi path Tesseract (sesuaikan dengan sistem Anda)
 # Windows
-# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# os.environ['TESSERACT_CMD'] = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 # Linux/Mac (biasanya sudah di PATH)
 
 class OCRApplication:
-    def __init__(self):
+    def __init__(self, cache=None, engine=None, deskew_min_angle=0.5, deskew_max_dim=1024,
+                 pipeline=None, metrics=None, cascade=None, target_dpi=None):
         self.supported_languages = {
             'eng': 'English',
             'ind': 'Indonesian',
             'eng+ind': 'English+Indonesian'
         }
+        self.last_batch_stats = None
+        # Pipeline preprocessing (lihat preprocessing.py); rotasi deskew
+        # dilewati jika kemiringan di bawah deskew_min_angle derajat.
+        # Pipeline default dibangun saat pertama dipakai (lihat pipeline)
+        self._pipeline = pipeline
+        self._deskew = (deskew_min_angle, deskew_max_dim)
+        # OCRCache opsional (lihat ocr_cache.py)
+        self.cache = cache
+        # Transport Tesseract tanpa file sementara (lihat tesseract_engine.py)
+        self.engine = engine or TesseractEngine()
+        # Hasil OCR terakhir per gambar, agar view berbeda tidak mengulang OCR
+        self._recent_results = OrderedDict()
+        # Timer/counter per tahap (lihat instrumentation.py), nonaktif secara default
+        self.metrics = metrics or Metrics(enabled=False)
+        # Cascade opsional (lihat cascade.py): pass murah dulu, pipeline penuh
+        # hanya jika confidence rendah
+        self.cascade = cascade
+        # DPI tujuan sebelum preprocessing; file ber-DPI tinggi langsung
+        # di-decode pada resolusi yang diperkecil (lihat image_handle.py)
+        self.target_dpi = target_dpi
         
+    @property
+    def pipeline(self):
+        """Pipeline preprocessing; default dibangun (dan cv2/numpy diimport)
+        hanya jika dipakai, sehingga --no-preprocess tetap cepat saat start"""
+        if self._pipeline is None:
+            from preprocessing import default_pipeline
+            self._pipeline = default_pipeline(*self._deskew)
+        return self._pipeline
+    
+    @pipeline.setter
+    def pipeline(self, pipeline):
+        self._pipeline = pipeline
+    
+    def cache_stats(self):
+        """Statistik hit/miss cache, None jika cache tidak aktif"""
+        return self.cache.stats() if self.cache else None
+    
+    def _settings(self, preprocess):
+        """Identitas pengaturan yang memengaruhi hasil OCR (cascade/pipeline dan target DPI)"""
+        if preprocess and self.cascade:
+            settings = self.cascade.signature()
+        elif preprocess:
+            settings = self.pipeline.signature()
+        else:
+            settings = 'raw'
+        if preprocess and self.target_dpi:
+            settings += f"@{self.target_dpi}dpi"
+        return settings
+    
+    def _cache_key(self, image_path, kind, lang, preprocess):
+        return self.cache.make_key(image_path, kind, lang, self._settings(preprocess),
+                                   self.engine.version)
+    
     def preprocess_image(self, image_path):
         """Preprocessing gambar untuk meningkatkan akurasi"""
         try:
-            # Baca gambar
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError("Gambar tidak dapat dibaca")
-            
-            # Konversi ke grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            return self._preprocess_image(image_path)
             
-            # Noise reduction
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # Thresholding
-            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Deskewing (rotasi otomatis)
-            coords = np.column_stack(np.where(thresh > 0))
-            angle = cv2.minAreaRect(coords)[-1]
+        except Exception as e:
+            self.metrics.record_error('preprocess', e)
+            print(f"Error preprocessing: {e}")
+            return None
+    
+    def open_image(self, source, grayscale=None):
+        """ImageHandle untuk path, bytes atau array; di-decode sekali saat dipakai
+
+        Jika grayscale tidak diberikan, gambar langsung di-decode grayscale
+        bila pipeline diawali stage Grayscale.
+        """
+        from image_handle import ImageHandle
+        if grayscale is None:
+            stages = [stage for stage in self.pipeline.stages if stage.enabled]
+            grayscale = bool(stages) and stages[0].name == 'grayscale'
+        return ImageHandle.open(source, grayscale=grayscale, target_dpi=self.target_dpi)
+    
+    def _normalize_dpi(self, img, dpi, context=None):
+        """Skala ulang ke target_dpi jika diatur dan DPI sumber diketahui
+
+        Skala dicatat di context['transform'] (lihat RescaleDPI).
+        """
+        if not (self.target_dpi and dpi):
+            return img, dpi
+        from preprocessing import RescaleDPI
+        context = {} if context is None else context
+        context['dpi'] = dpi
+        out = RescaleDPI(self.target_dpi).apply(img, context)
+        return (img, dpi) if out is None else (out, self.target_dpi)
+    
+    def _read_image(self, image, context=None):
+        """Decode path atau ImageHandle sekali; kembalikan (array, dpi)
+
+        Decode resolusi rendah (IMREAD_REDUCED) dan normalisasi DPI dicatat
+        di context['transform'] relatif terhadap gambar resolusi penuh.
+        """
+        from image_handle import ImageHandle
+        from preprocessing import record_transform
+        handle = image if isinstance(image, ImageHandle) else self.open_image(image)
+        with self.metrics.timer('decode'):
+            img = handle.array
+        context = {} if context is None else context
+        if handle.reduce > 1:
+            scale = 1 / handle.reduce
+            record_transform(context, [[scale, 0, 0], [0, scale, 0]])
+        return self._normalize_dpi(img, handle.dpi, context)
+    
+    def _preprocess_image(self, image_path, context=None):
+        """Preprocessing tanpa menangkap error (dipakai batch worker)
+
+        image_path boleh berupa ImageHandle yang sudah di-decode. context
+        (dict) opsional menerima catatan stage, mis. 'transform'.
+        """
+        context = {} if context is None else context
+        img, context['dpi'] = self._read_image(image_path, context)
+        
+        # Grayscale, noise reduction, thresholding, deskewing, dst.
+        return self.pipeline.run(img, context, metrics=self.metrics)
+    
+    def preprocess_stats(self):
+        """Waktu dan ukuran alokasi per stage preprocessing (run terakhir dan total)"""
+        return {
+            'last': self.pipeline.last_stats,
+            'totals': self.pipeline.totals
+        }
+    
+    def recognize(self, image_path, lang='eng', preprocess=True):
+        """Jalankan OCR sekali dan kembalikan OCRResult (teks, kata, baris, blok, box)"""
+        try:
+            return self._recognize(image_path, lang=lang, preprocess=preprocess)
             
-            if angle < -45:
-                angle = -(90 + angle)
+        except Exception as e:
+            self.metrics.record_error('recognize', e)
+            print(f"Error recognizing: {e}")
+            return None
+    
+    def _recognize(self, image_path, lang='eng', preprocess=True, handle=None):
+        """OCR satu pass tanpa menangkap error (dipakai batch worker)
+
+        handle (ImageHandle) opsional dipakai ulang agar file tidak di-decode lagi.
+        """
+        st = os.stat(image_path)
+        recent_key = (os.path.abspath(image_path), st.st_mtime_ns, st.st_size, lang,
+                      self._settings(preprocess))
+        result = self._recent_results.get(recent_key)
+        if result is not None:
+            return result
+        
+        if self.cache:
+            key = self._cache_key(image_path, 'result', lang, preprocess)
+            cached = self.cache.get(key)
+            # Entry lama tanpa transform tidak bisa dipetakan ke gambar sumber
+            if cached is not None and not {'transform', 'pages'} & cached['meta'].keys():
+                cached = None
+            if cached is not None:
+                self.metrics.incr('cache_hits')
+                result = OCRResult.from_dict(cached)
             else:
-                angle = -angle
-                
-            (h, w) = thresh.shape[:2]
-            center = (w // 2, h // 2)
-            M = cv2.getRotationMatrix2D(center, angle, 1.0)
-            rotated = cv2.warpAffine(thresh, M, (w, h), 
-                                    flags=cv2.INTER_CUBIC, 
-                                    borderMode=cv2.BORDER_REPLICATE)
-            
-            return rotated
-            
+                self.metrics.incr('cache_misses')
+        
+        if result is None:
+            from page_reader import is_multipage
+            if is_multipage(image_path):
+                # TIFF multi-halaman/PDF: semua halaman, bukan hanya frame pertama
+                result = self._recognize_document(image_path, lang=lang, preprocess=preprocess)
+            elif preprocess:
+                # Pipeline (atau cascade) dijalankan di _recognize_image
+                context = {}
+                img, dpi = self._read_image(handle or image_path, context)
+                result = self._recognize_image(img, lang=lang, dpi=dpi, context=context)
+            else:
+                # Bytes file langsung dikirim ke Tesseract tanpa decode
+                result = self._recognize_image(image_path, lang=lang, preprocess=False)
+            result.meta['preprocess'] = preprocess
+            if self.cache:
+                self.cache.put(key, result.to_dict())
+        
+        self._recent_results[recent_key] = result
+        while len(self._recent_results) > 8:
+            self._recent_results.popitem(last=False)
+        return result
+    
+    def _recognize_image(self, image, lang='eng', preprocess=True, dpi=None, context=None):
+        """OCR satu pass untuk gambar di memori (array halaman dokumen)
+
+        context berisi transform yang sudah dilakukan sebelum gambar ini
+        (decode diperkecil, normalisasi DPI; lihat _read_image).
+        """
+        context = {} if context is None else context
+        if preprocess:
+            image, dpi = self._normalize_dpi(image, dpi, context)
+        if preprocess and self.cascade:
+            return self.cascade.run(self, image, lang=lang, dpi=dpi, context=context)
+        meta = {'preprocess': preprocess}
+        if preprocess:
+            context['dpi'] = dpi
+            image = self.pipeline.run(image, context, metrics=self.metrics)
+        # Box hasil berada di frame setelah skala/deskew/crop (lihat overlay.draw_boxes)
+        meta['transform'] = context.get('transform', IDENTITY_TRANSFORM)
+        with self.metrics.timer('recognize'):
+            data = self.engine.image_to_data(image, lang=lang)
+        self.metrics.incr('images')
+        return OCRResult(data, lang=lang, meta=meta)
+
+    def _recognize_document(self, document_path, lang='eng', preprocess=True):
+        """OCR semua halaman dokumen (lihat page_reader.iter_pages) menjadi satu OCRResult
+
+        Halaman di-decode satu per satu; page_num hasil adalah nomor halaman.
+        """
+        from page_reader import iter_pages
+        pages = [(number, self._recognize_image(image, lang=lang, preprocess=preprocess,
+                                                dpi=dpi))
+                 for number, image, dpi in iter_pages(document_path)]
+        return OCRResult.from_pages(pages, lang=lang, meta={'pages': len(pages)})
+
+    def _recognize_bytes(self, data, lang='eng', preprocess=True):
+        """OCR untuk bytes file gambar (mis. body request HTTP)"""
+        if not preprocess:
+            # Bytes dikirim langsung ke Tesseract tanpa decode
+            return self._recognize_image(data, lang=lang, preprocess=False)
+
+        context = {}
+        img, dpi = self._read_image(self.open_image(data), context)
+        return self._recognize_image(img, lang=lang, preprocess=True, dpi=dpi, context=context)
+
+    def recognize_tiled(self, image_path, lang='eng', preprocess=True, tile_size=2048,
+                        overlap=None, workers=None):
+        """OCR gambar besar per tile secara paralel (lihat tiling.py)"""
+        try:
+            return self._recognize_tiled(image_path, lang=lang, preprocess=preprocess,
+                                         tile_size=tile_size, overlap=overlap,
+                                         workers=workers)
+
         except Exception as e:
-            print(f"Error preprocessing: {e}")
+            self.metrics.record_error('recognize_tiled', e)
+            print(f"Error recognizing tiles: {e}")
             return None
+
+    def _recognize_tiled(self, image_path, lang='eng', preprocess=True, tile_size=2048,
+                         overlap=None, workers=None):
+        """OCR per tile tanpa menangkap error"""
+        from tiling import recognize_tiled
+
+        context = {}
+        if preprocess:
+            # Preprocessing (terutama deskew) dijalankan sekali untuk seluruh gambar
+            image = self._preprocess_image(image_path, context)
+        else:
+            image, _ = self._read_image(image_path, context)
+
+        result = recognize_tiled(self, image, lang=lang, tile_size=tile_size,
+                                 overlap=overlap, workers=workers)
+        result.meta['preprocess'] = preprocess
+        result.meta['transform'] = context.get('transform', IDENTITY_TRANSFORM)
+        return result
+
+    def extract_pages(self, document_path, lang='eng', preprocess=True, workers=None,
+                      ordered=True, dpi=300, with_boxes=False):
+        """OCR dokumen multi-halaman (TIFF/PDF) halaman per halaman
+
+        Generator yang menghasilkan dict per halaman (page, text,
+        mean_confidence, error, dan word_boxes jika with_boxes=True)
+        begitu halaman selesai. Halaman di-decode
+        satu per satu dan maksimal workers * 2 halaman berada di memori;
+        workers > 1 menjalankan OCR beberapa halaman secara paralel.
+        """
+        from page_reader import iter_pages
+        
+        def ocr_page(number, image, page_dpi):
+            try:
+                result = self._recognize_image(image, lang=lang, preprocess=preprocess,
+                                               dpi=page_dpi)
+                page = {
+                    'page': number,
+                    'text': result.text.strip(),
+                    'mean_confidence': round(result.mean_confidence, 2),
+                    'error': ''
+                }
+                if with_boxes:
+                    page['word_boxes'] = result.word_boxes
+                return page
+            except Exception as e:
+                self.metrics.record_error('page', e)
+                return {'page': number, 'text': '', 'mean_confidence': 0.0,
+                        'error': f"{type(e).__name__}: {e}"}
+        
+        workers = workers or os.cpu_count() or 1
+        pages = iter_pages(document_path, dpi=dpi)
+        if workers == 1:
+            for page in pages:
+                yield ocr_page(*page)
+            return
+        
+        from concurrent.futures import ThreadPoolExecutor
+        from batch_engine import bounded_map
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from bounded_map(pool, ocr_page, pages, max_inflight=workers * 2,
+                                   ordered=ordered)
     
     def extract_text(self, image_path, lang='eng', preprocess=True):
         """Ekstrak teks dari gambar"""
         try:
-            if preprocess:
-                processed_img = self.preprocess_image(image_path)
-                if processed_img is None:
-                    return ""
-                text = pytesseract.image_to_string(processed_img, lang=lang)
-            else:
-                text = pytesseract.image_to_string(Image.open(image_path), lang=lang)
-            
-            return text.strip()
+            return self._extract_text(image_path, lang=lang, preprocess=preprocess)
             
         except Exception as e:
+            self.metrics.record_error('extract_text', e)
             print(f"Error extracting text: {e}")
             return ""
     
-    def extract_with_details(self, image_path, lang='eng'):
-        """Ekstrak teks dengan detail confidence"""
+    def _extract_text(self, image_path, lang='eng', preprocess=True, handle=None):
+        """Ekstrak teks tanpa menangkap error (dipakai batch worker)"""
+        return self._recognize(image_path, lang=lang, preprocess=preprocess,
+                               handle=handle).text.strip()
+    
+    def extract_with_details(self, image_path, lang='eng', preprocess=True, columnar=False):
+        """Ekstrak teks dengan detail confidence
+
+        columnar=True mengembalikan WordBoxes (lihat word_boxes.py) alih-alih
+        list dict per kata.
+        """
         try:
-            img = Image.open(image_path)
-            data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
-            
-            results = []
-            for i in range(len(data['text'])):
-                if data['text'][i].strip():
-                    results.append({
-                        'text': data['text'][i],
-                        'confidence': int(data['conf'][i]),
-                        'position': {
-                            'x': data['left'][i],
-                            'y': data['top'][i],
-                            'width': data['width'][i],
-                            'height': data['height'][i]
-                        }
-                    })
-            
-            return results
+            result = self._recognize(image_path, lang=lang, preprocess=preprocess)
+            return result.word_boxes if columnar else result.word_details()
             
         except Exception as e:
+            self.metrics.record_error('extract_with_details', e)
             print(f"Error: {e}")
-            return []
+            return None if columnar else []
     
     def calculate_accuracy(self, extracted_text, ground_truth):
-        """Hitung akurasi dengan berbagai metrik"""
-        if not extracted_text or not ground_truth:
-            return 0.0
-        
-        extracted = extracted_text.lower().strip()
-        ground = ground_truth.lower().strip()
-        
-        # Character Accuracy
-        correct_chars = sum(1 for a, b in zip(extracted, ground) if a == b)
-        char_accuracy = (correct_chars / max(len(extracted), len(ground))) * 100
-        
-        # Word Accuracy
-        extracted_words = set(extracted.split())
-        ground_words = set(ground.split())
-        common_words = extracted_words.intersection(ground_words)
-        
-        if ground_words:
-            word_accuracy = (len(common_words) / len(ground_words)) * 100
-        else:
-            word_accuracy = 0
-        
-        # Levenshtein Distance (similarity)
-        distance = self.levenshtein_distance(extracted, ground)
-        max_len = max(len(extracted), len(ground))
-        similarity = ((max_len - distance) / max_len) * 100 if max_len > 0 else 0
-        
-        return {
-            'character_accuracy': round(char_accuracy, 2),
-            'word_accuracy': round(word_accuracy, 2),
-            'similarity_score': round(similarity, 2),
-            'average_accuracy': round((char_accuracy + word_accuracy + similarity) / 3, 2)
-        }
+        """Hitung akurasi dengan berbagai metrik (termasuk CER dan WER)"""
+        from text_metrics import accuracy_metrics
+        return accuracy_metrics(extracted_text, ground_truth)
+    
+    def calculate_accuracy_batch(self, pairs, workers=1):
+        """Hitung akurasi untuk banyak pasangan (extracted, ground_truth) sekaligus"""
+        from text_metrics import score_pairs
+        return score_pairs(pairs, workers=workers)
     
-    def levenshtein_distance(self, s1, s2):
+    def levenshtein_distance(self, s1, s2, max_distance=None):
         """Menghitung Levenshtein distance antara dua string"""
-        if len(s1) < len(s2):
-            return self.levenshtein_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = range(len(s2) + 1)
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        from text_metrics import levenshtein_distance
+        return levenshtein_distance(s1, s2, max_distance=max_distance)
     
-    def batch_process(self, image_folder, output_csv='results.csv', lang='eng'):
-        """Proses batch multiple images"""
-        results = []
+    def batch_process(self, image_folder, output_csv='results.csv', lang='eng',
+                      workers=None, ordered=True, resume=True, chunk_size=100,
+                      image_paths=None, recursive=False, include=None, exclude=None,
+                      shard=None, boxes_path=None, index_path=None, dedup_threshold=None):
+        """Proses batch multiple images secara paralel
+
+        workers=None memakai semua core, workers=1 memproses berurutan.
+        ordered=False menulis hasil sesuai urutan selesai.
+        Hasil ditulis bertahap ke CSV (atau JSONL jika output berakhiran
+        .jsonl); dengan resume=True file yang sudah tercatat di manifest
+        dilewati. image_paths dapat menggantikan isi image_folder.
+        Folder ditelusuri secara lazy (recursive, pola include/exclude);
+        shard=(i, N) hanya memproses bagian ke-i dari N (lihat
+        batch_engine.in_shard). boxes_path menyimpan word box semua halaman
+        ke file kolom biner (lihat word_boxes.py); index_path memperbarui
+        inverted index teks (lihat text_index.py) begitu hasil selesai.
+        dedup_threshold (bit Hamming) mengaktifkan deteksi near-duplicate:
+        gambar yang hampir identik memakai ulang hasil OCR (lihat dedup.py).
+        Mengembalikan statistik batch.
+        """
+        from batch_engine import scan_images, in_shard, iter_results, BatchStats, RESULT_FIELDS
+        from result_writer import StreamingResultWriter
+
+        stats = BatchStats()
         
-        for filename in os.listdir(image_folder):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
-                image_path = os.path.join(image_folder, filename)
-                print(f"Processing: {filename}")
-                
-                text = self.extract_text(image_path, lang=lang)
-                
-                results.append({
-                    'filename': filename,
-                    'extracted_text': text,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'language': lang
-                })
+        with StreamingResultWriter(output_csv, RESULT_FIELDS, chunk_size=chunk_size,
+                                   resume=resume) as writer:
+            done = writer.completed()
+            if image_paths is None:
+                image_paths = scan_images(image_folder, recursive=recursive,
+                                          include=include, exclude=exclude)
+            if shard:
+                image_paths = in_shard(image_paths, shard, root=image_folder)
+            image_paths = (path for path in image_paths if path not in done)
+            if done:
+                print(f"Resuming: {len(done)} files already processed")
+            
+            boxes = None
+            if boxes_path:
+                from word_boxes import WordBoxWriter, next_part_path, recover_parts
+                for part, count in recover_parts(boxes_path).items():
+                    print(f"Recovered {count} pages of word boxes in {part}")
+                if done:
+                    # Run lanjutan ditulis ke file part baru, file lama tetap utuh
+                    boxes_path = next_part_path(boxes_path)
+                boxes = WordBoxWriter(boxes_path)
+                writer.checkpoint_hooks.append(boxes.checkpoint)
+            index = None
+            if index_path:
+                from text_index import TextIndex
+                index = TextIndex(index_path)
+                # Halaman yang tercatat di manifest harus sudah ter-commit di index
+                writer.checkpoint_hooks.append(index.commit)
+            dedup = None
+            if dedup_threshold is not None:
+                from dedup import Deduplicator
+                dedup = Deduplicator(dedup_threshold)
+            
+            try:
+                for records in iter_results(image_paths, lang=lang, workers=workers,
+                                            ordered=ordered, app=self,
+                                            with_boxes=bool(boxes_path or index_path),
+                                            dedup=dedup):
+                    # Metrics dari proses worker digabung ke metrics aplikasi
+                    self.metrics.merge(records[0].pop('_metrics', None))
+                    self._write_records(records, writer, stats, boxes, index)
+            finally:
+                # Chunk terakhir (dan checkpoint pendampingnya) sebelum box/index ditutup
+                writer.flush()
+                if boxes is not None:
+                    boxes.close()
+                    if boxes.documents:
+                        print(f"Word boxes saved to {boxes_path}")
+                if index is not None:
+                    index.close()
+                    print(f"Index updated: {index_path}")
         
-        # Save to CSV
-        df = pd.DataFrame(results)
-        df.to_csv(output_csv, index=False, encoding='utf-8')
+        print(stats)
         print(f"Results saved to {output_csv}")
+        self.last_batch_stats = stats.as_dict()
         
-        return df
+        return self.last_batch_stats
     
-    def visualize_results(self, image_path, lang='eng'):
-        """Visualisasi hasil OCR dengan bounding boxes"""
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def _write_records(self, records, writer, stats, boxes=None, index=None):
+        """Catat dan tulis record hasil satu file (semua halamannya)"""
+        # File dengan halaman gagal tidak masuk manifest agar dicoba lagi saat resume
+        done = not any(record['error'] for record in records)
+        for record in records:
+            word_boxes = record.pop('_boxes', None)
+            if word_boxes is not None:
+                if boxes is not None:
+                    boxes.add(word_boxes, record['path'], int(record['page']))
+                if index is not None:
+                    with self.metrics.timer('index'):
+                        index.add_word_boxes(record['path'], int(record['page']), word_boxes)
+            stats.update(record)
+            label = record['filename']
+            if len(records) > 1:
+                label += f" [page {record['page']}]"
+            if record['error']:
+                print(f"Failed: {label} ({record['error']})")
+            elif record.get('duplicate_of'):
+                print(f"Duplicate: {label} (reused OCR of {record['duplicate_of']})")
+            else:
+                print(f"Processed: {label}")
+            # Path masuk manifest bersama halaman terakhirnya
+            with self.metrics.timer('output'):
+                writer.write(record, key=record['path'] if done and record is records[-1]
+                             else None)
+    
+    def visualize_results(self, image_path, lang='eng', preprocess=True, result=None,
+                          output_path=None):
+        """Visualisasi hasil OCR dengan bounding boxes
+
+        Memakai OCRResult yang sama dengan extract_text/extract_with_details
+        (atau result yang diberikan), tanpa OCR ulang. Jika output_path
+        diberikan, gambar disimpan ke file tanpa membuka jendela plot.
+        Untuk banyak halaman sekaligus lihat overlay.render_overlays.
+        """
+        import cv2
+        from overlay import draw_boxes
         
-        # Get OCR data with boxes
-        data = pytesseract.image_to_data(gray, lang=lang, output_type=pytesseract.Output.DICT)
+        # Handle berwarna yang sama dipakai untuk OCR dan untuk digambar
+        handle = self.open_image(image_path, grayscale=False)
+        if result is None:
+            result = self._recognize(image_path, lang=lang, preprocess=preprocess,
+                                     handle=handle)
+        img = handle.array.copy()
         
-        n_boxes = len(data['text'])
-        for i in range(n_boxes):
-            if int(data['conf'][i]) > 60:  # Only high confidence boxes
-                (x, y, w, h) = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
-                img = cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                img = cv2.putText(img, data['text'][i], (x, y - 10), 
-                                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        # Only high confidence boxes. Transform hasil memetakan box ke gambar
+        # resolusi penuh; handle bisa di-decode diperkecil (reduce)
+        draw_boxes(img, result.word_boxes, min_confidence=60, color=(0, 255, 0), labels=True,
+                   scale=1 / handle.reduce)
         
+        if output_path:
+            cv2.imwrite(output_path, img)
+            return img
+        
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(15, 10))
         plt.imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
         plt.title('OCR Results with Bounding Boxes')
@@ -206,9 +519,8 @@ class OCRApplication:
         
         return img
 
-def main():
-    app = OCRApplication()
-    
+def interactive_menu(app):
+    """Menu interaktif (perilaku lama main.py tanpa argumen)"""
     while True:
         print("\n=== OCR Application ===")
         print("1. Extract text from single image")
@@ -273,5 +585,408 @@ def main():
         else:
             print("Invalid option!")
 
+
+def read_paths(paths):
+    """Daftar path dari argumen; '-' atau argumen kosong berarti baca dari stdin"""
+    if paths and paths != ['-']:
+        return paths
+    return [line.strip() for line in sys.stdin if line.strip()]
+
+
+def cmd_extract(app, args):
+    setup_cascade(app, args)
+    status = 0
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        image_paths = read_paths(args.images)
+        for image_path in image_paths:
+            if not os.path.exists(image_path):
+                print(f"File not found: {image_path}", file=sys.stderr)
+                status = 1
+                continue
+            if args.tile:
+                result = app.recognize_tiled(image_path, lang=args.lang,
+                                             preprocess=not args.no_preprocess,
+                                             tile_size=args.tile, overlap=args.tile_overlap)
+            else:
+                result = app.recognize(image_path, lang=args.lang,
+                                       preprocess=not args.no_preprocess)
+            text = result.text.strip() if result else ""
+            if args.json:
+                record = {'path': image_path, 'text': text}
+                if result and 'tier' in result.meta:
+                    record['tier'] = result.meta['tier']
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            else:
+                if len(image_paths) > 1:
+                    out.write(f"==> {image_path} <==\n")
+                out.write(text + '\n')
+    finally:
+        if args.output:
+            out.close()
+    if app.cascade:
+        report_tiers(app)
+    return status
+
+
+def cmd_batch(app, args):
+    image_paths = None
+    if args.files_from:
+        if args.files_from == '-':
+            image_paths = read_paths(['-'])
+        else:
+            with open(args.files_from, 'r', encoding='utf-8') as f:
+                image_paths = [line.strip() for line in f if line.strip()]
+    elif not args.folder:
+        print("Provide a folder or --files-from", file=sys.stderr)
+        return 2
+    elif not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return 1
+    
+    shard = None
+    if args.shard:
+        from batch_engine import parse_shard
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    
+    setup_cascade(app, args)
+    stats = app.batch_process(args.folder, args.output, lang=args.lang,
+                              workers=args.workers, ordered=not args.unordered,
+                              resume=not args.no_resume, chunk_size=args.chunk_size,
+                              image_paths=image_paths, recursive=args.recursive,
+                              include=args.include, exclude=args.exclude, shard=shard,
+                              boxes_path=args.boxes, index_path=args.index,
+                              dedup_threshold=args.dedup_threshold if args.dedup else None)
+    if app.cascade:
+        report_tiers(app)
+    return 1 if stats['failed'] else 0
+
+
+def cmd_merge(app, args):
+    from batch_engine import RESULT_FIELDS
+    from result_writer import merge_results
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    rows = merge_results(args.inputs, args.output, RESULT_FIELDS)
+    print(f"Merged {rows} rows from {len(args.inputs)} files into {args.output}")
+    return 0
+
+
+def cmd_index(app, args):
+    from text_index import TextIndex
+    from word_boxes import WordBoxFile
+    missing = [path for path in args.boxes if not os.path.exists(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    try:
+        box_files = [WordBoxFile(path) for path in args.boxes]
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    with TextIndex(args.index) as index:
+        for path, box_file in zip(args.boxes, box_files):
+            count = index.add_word_box_file(box_file)
+            print(f"Indexed {count} pages from {path}")
+        stats = index.stats()
+    print(f"Index: {stats['documents']} pages, {stats['terms']} terms")
+    return 0
+
+
+def cmd_search(app, args):
+    from text_index import TextIndex
+    if not os.path.exists(args.index):
+        print(f"Index not found: {args.index}", file=sys.stderr)
+        return 1
+    with TextIndex(args.index) as index:
+        results = index.search(' '.join(args.query), phrase=args.phrase, limit=args.limit)
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{result['path']} [page {result['page']}]: {result['hits']} hits, "
+                  f"first at {result['boxes'][0]}")
+    return 0 if results else 1
+
+
+def cmd_accuracy(app, args):
+    if args.truth_file:
+        with open(args.truth_file, 'r', encoding='utf-8') as f:
+            ground_truth = f.read()
+    else:
+        ground_truth = args.truth
+    
+    extracted = app.extract_text(args.image, lang=args.lang)
+    accuracy = app.calculate_accuracy(extracted, ground_truth)
+    if args.json:
+        print(json.dumps(accuracy))
+    else:
+        for metric, value in accuracy.items():
+            print(f"{metric.replace('_', ' ').title()}: {value}%")
+    return 0
+
+
+def cmd_visualize(app, args):
+    if not os.path.exists(args.image):
+        print(f"File not found: {args.image}", file=sys.stderr)
+        return 1
+    app.visualize_results(args.image, lang=args.lang, output_path=args.output)
+    if args.output:
+        print(f"Saved to {args.output}")
+    return 0
+
+
+def cmd_overlay(app, args):
+    from overlay import render_overlays
+    from batch_engine import BatchStats
+    missing = [path for path in args.boxes if not os.path.exists(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    stats = BatchStats()
+    for result in render_overlays(args.boxes, args.output, min_confidence=args.min_conf,
+                                  max_dim=args.max_dim, labels=args.labels, fmt=args.format, workers=args.workers,
+                                  base_dir=args.root):
+        stats.update(result)
+        label = f"{result['source']} [page {result['page']}]"
+        if result['error']:
+            print(f"Failed: {label} ({result['error']})")
+        elif args.verbose:
+            print(f"Rendered: {label} -> {result['output']} ({result['boxes']} boxes)")
+    print(stats)
+    print(f"Overlays saved to {args.output}")
+    return 1 if stats.failed else 0
+
+
+def cmd_watch(app, args):
+    if not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return 1
+    from watcher import FolderWatcher
+    setup_cascade(app, args)
+    watcher = FolderWatcher(app, args.folder, args.output, lang=args.lang,
+                            workers=args.workers, interval=args.interval, settle=args.settle,
+                            recursive=args.recursive, include=args.include,
+                            exclude=args.exclude, full_scan_interval=args.full_scan,
+                            boxes_path=args.boxes, index_path=args.index,
+                            dedup_threshold=args.dedup_threshold if args.dedup else None)
+    stats = watcher.run(once=args.once)
+    return 1 if stats['failed'] else 0
+
+
+def cmd_serve(app, args):
+    from ocr_server import serve
+    serve(args.host, args.port, app=app, workers=args.workers, max_queue=args.max_queue,
+          batch_size=args.batch_size, timeout=args.timeout)
+    return 0
+
+
+def add_cascade_arguments(parser):
+    parser.add_argument('--cascade', action='store_true',
+                        help="try a cheap pass first, full preprocessing only on low confidence")
+    parser.add_argument('--min-confidence', type=float, default=75.0)
+    parser.add_argument('--fast-max-dim', type=int, default=None,
+                        help="downscale the cheap pass to this longest side")
+
+
+def setup_cascade(app, args):
+    if not args.cascade:
+        return
+    from cascade import Cascade
+    app.cascade = Cascade.default(app.pipeline, min_confidence=args.min_confidence,
+                                  fast_max_dim=args.fast_max_dim)
+    app.metrics = Metrics()
+
+
+def report_tiers(app):
+    """Ringkasan tier cascade yang melayani setiap gambar"""
+    snapshot = app.metrics.snapshot()
+    served = {name.rsplit('.', 1)[1]: count for name, count in snapshot['counters'].items()
+              if name.startswith('cascade.served.')}
+    if not served:
+        return
+    total = sum(served.values())
+    print("\n=== Cascade tiers ===", file=sys.stderr)
+    for tier in app.cascade.tiers:
+        timer = snapshot['timers'].get(f"cascade.{tier.name}")
+        mean_ms = f", {timer['mean'] * 1000:.1f} ms/attempt" if timer else ''
+        print(f"{tier.name}: {served.get(tier.name, 0)}/{total} images{mean_ms}", file=sys.stderr)
+    ocr_calls = snapshot['counters'].get('images', 0)
+    print(f"OCR passes per image: {ocr_calls / total:.2f}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="OCR Application")
+    parser.add_argument('--time', action='store_true',
+                        help="print start-up and total time to stderr")
+    parser.add_argument('--target-dpi', type=int, default=None,
+                        help="rescale images to this DPI before preprocessing")
+    sub = parser.add_subparsers(dest='command')
+    
+    p = sub.add_parser('extract', help="extract text from images (paths or stdin)")
+    p.add_argument('images', nargs='*', help="image paths, '-' or none to read stdin")
+    p.add_argument('--lang', default='eng')
+    p.add_argument('--no-preprocess', action='store_true')
+    p.add_argument('--json', action='store_true', help="write JSON lines")
+    p.add_argument('--tile', type=int, default=None, metavar='SIZE',
+                   help="OCR large images in parallel tiles of SIZE pixels")
+    p.add_argument('--tile-overlap', type=int, default=None,
+                   help="tile overlap in pixels (default: 320, at most a quarter of the tile)")
+    add_cascade_arguments(p)
+    p.add_argument('-o', '--output', default=None)
+    p.set_defaults(func=cmd_extract)
+    
+    p = sub.add_parser('batch', help="batch process a folder or a file list")
+    p.add_argument('folder', nargs='?')
+    p.add_argument('--files-from', default=None, help="file with one path per line, '-' for stdin")
+    p.add_argument('-o', '--output', default='results.csv')
+    p.add_argument('--lang', default='eng')
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--unordered', action='store_true', help="write results as they complete")
+    p.add_argument('--no-resume', action='store_true')
+    p.add_argument('--chunk-size', type=int, default=100)
+    p.add_argument('-r', '--recursive', action='store_true', help="scan subfolders")
+    p.add_argument('--include', action='append', default=None, metavar='GLOB',
+                   help="only files matching this pattern (repeatable)")
+    p.add_argument('--exclude', action='append', default=None, metavar='GLOB',
+                   help="skip files/folders matching this pattern (repeatable)")
+    p.add_argument('--shard', default=None, metavar='i/N',
+                   help="process only shard i of N (0-based), e.g. 0/4")
+    p.add_argument('--boxes', default=None, metavar='PATH',
+                   help="also store word boxes in a memory-mappable .wbx file")
+    p.add_argument('--index', default=None, metavar='PATH',
+                   help="update a full-text index (SQLite) as results complete")
+    p.add_argument('--dedup', action='store_true',
+                   help="reuse OCR results for near-duplicate images (perceptual hash)")
+    p.add_argument('--dedup-threshold', type=int, default=48, metavar='BITS',
+                   help="max Hamming distance (of 256 bits) for --dedup candidates "
+                        "(default: 48); candidates are confirmed pixel by pixel")
+    add_cascade_arguments(p)
+    p.set_defaults(func=cmd_batch)
+    
+    p = sub.add_parser('index', help="build a full-text index from .wbx word box files")
+    p.add_argument('index')
+    p.add_argument('boxes', nargs='+', help=".wbx files written by 'batch --boxes'")
+    p.set_defaults(func=cmd_index, needs_app=False)
+    
+    p = sub.add_parser('search', help="search a full-text index")
+    p.add_argument('index')
+    p.add_argument('query', nargs='+')
+    p.add_argument('--phrase', action='store_true', help="match words as an exact phrase")
+    p.add_argument('--limit', type=int, default=20)
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_search, needs_app=False)
+    
+    p = sub.add_parser('merge', help="merge batch outputs from several shards "
+                                         "(last row per file/page wins)")
+    p.add_argument('inputs', nargs='+')
+    p.add_argument('-o', '--output', required=True)
+    p.set_defaults(func=cmd_merge, needs_app=False)
+    
+    p = sub.add_parser('accuracy', help="compare OCR output with ground truth")
+    p.add_argument('image')
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument('--truth')
+    group.add_argument('--truth-file')
+    p.add_argument('--lang', default='eng')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_accuracy)
+    
+    p = sub.add_parser('visualize', help="draw OCR bounding boxes")
+    p.add_argument('image')
+    p.add_argument('--lang', default='eng')
+    p.add_argument('-o', '--output', default=None, help="save instead of showing a window")
+    p.set_defaults(func=cmd_visualize)
+    
+    p = sub.add_parser('overlay', help="render box overlays from stored word boxes (no OCR)")
+    p.add_argument('boxes', nargs='+', help=".wbx files written by 'batch --boxes'")
+    p.add_argument('-o', '--output', default='overlays', help="output folder")
+    p.add_argument('--min-conf', type=float, default=None,
+                   help="only draw words above this confidence")
+    p.add_argument('--max-dim', type=int, default=None,
+                   help="thumbnail size: longest side in pixels")
+    p.add_argument('--labels', action='store_true', help="also draw the recognized text")
+    p.add_argument('--format', default='jpg', choices=['jpg', 'png', 'webp'])
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--root', default=None, metavar='DIR',
+                   help="folder that relative source paths in the .wbx are relative to "
+                        "(the working directory of the batch run)")
+    p.add_argument('-v', '--verbose', action='store_true', help="list every rendered page")
+    p.set_defaults(func=cmd_overlay, needs_app=False)
+    
+    p = sub.add_parser('watch', help="watch a folder and OCR only new or changed images")
+    p.add_argument('folder')
+    p.add_argument('-o', '--output', default='results.csv', help="results are appended")
+    p.add_argument('--lang', default='eng')
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--interval', type=float, default=2.0, help="seconds between polls")
+    p.add_argument('--settle', type=float, default=2.0,
+                   help="seconds a new file must stay unchanged before processing")
+    p.add_argument('--full-scan', type=float, default=300, metavar='SECONDS',
+                   help="re-stat every file this often to catch in-place edits (0: never)")
+    p.add_argument('--once', action='store_true',
+                   help="process what is there now, then exit")
+    p.add_argument('-r', '--recursive', action='store_true', help="watch subfolders")
+    p.add_argument('--include', action='append', default=None, metavar='GLOB')
+    p.add_argument('--exclude', action='append', default=None, metavar='GLOB')
+    p.add_argument('--boxes', default=None, metavar='PATH',
+                   help="also store word boxes in a .wbx file")
+    p.add_argument('--index', default=None, metavar='PATH',
+                   help="update a full-text index (SQLite) as results complete")
+    p.add_argument('--dedup', action='store_true',
+                   help="reuse OCR results for near-duplicate images")
+    p.add_argument('--dedup-threshold', type=int, default=48, metavar='BITS')
+    add_cascade_arguments(p)
+    p.set_defaults(func=cmd_watch)
+    
+    p = sub.add_parser('serve', help="run the local OCR HTTP service")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--max-queue', type=int, default=64)
+    p.add_argument('--batch-size', type=int, default=8)
+    p.add_argument('--timeout', type=float, default=30.0)
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('menu', help="interactive menu (default)")
+    p.set_defaults(func=lambda app, args: interactive_menu(app))
+    
+    return parser
+
+
+def report_timing(command_start):
+    now = time.perf_counter()
+    startup_ms = (command_start - _START) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    budget = "within" if startup_ms <= STARTUP_BUDGET_MS else "OVER"
+    print(f"startup {startup_ms:.1f} ms ({budget} {STARTUP_BUDGET_MS} ms budget), "
+          f"total {(now - _START) * 1000:.1f} ms, heavy modules: {', '.join(loaded) or 'none'}",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    
+    # Perintah tanpa OCR (needs_app=False) tidak membangun OCRApplication,
+    # sehingga tidak ikut mengimport preprocessing (cv2/numpy)
+    app = None
+    if getattr(args, 'needs_app', True):
+        app = OCRApplication(target_dpi=args.target_dpi)
+    command_start = time.perf_counter()
+    if args.command is None:
+        status = interactive_menu(app)
+    else:
+        status = args.func(app, args)
+    
+    if args.time:
+        report_timing(command_start)
+    return status or 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class OCRCache:
+    """Cache hasil OCR berbasis hash konten gambar
+
+    Tier memori berupa LRU (max_entries), tier disk opsional di disk_dir
+    dengan batas ukuran max_disk_bytes (file terlama dihapus lebih dulu).
+    Value harus dapat diserialisasi ke JSON.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._setup()
+
+    def _setup(self):
+        self._memory = OrderedDict()
+        self._file_digests = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_bytes = None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # Lock dan isi memori tidak ikut ke proses worker
+    def __getstate__(self):
+        return {
+            'max_entries': self.max_entries,
+            'disk_dir': self.disk_dir,
+            'max_disk_bytes': self.max_disk_bytes
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def file_digest(self, image_path):
+        """Hash isi file; di-memo per (path, mtime, size) agar hit tidak membaca ulang file"""
+        st = os.stat(image_path)
+        stat_key = (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+        digest = self._file_digests.get(stat_key)
+        if digest is None:
+            h = hashlib.blake2b(digest_size=20)
+            with open(image_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+            if len(self._file_digests) >= self.max_entries:
+                self._file_digests.clear()
+            self._file_digests[stat_key] = digest
+        return digest
+
+    def make_key(self, image_path, kind, lang, settings='', version=''):
+        """Key = hash gambar + jenis hasil + bahasa + setting preprocessing + versi Tesseract
+
+        version diambil dari engine yang aktif (lihat TesseractEngine.version).
+        """
+        parts = [self.file_digest(image_path), kind, lang, settings, version]
+        return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=20).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.json')
+
+    def get(self, key):
+        """Ambil value dari cache, None jika tidak ada"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Simpan value ke tier memori dan disk"""
+        with self._lock:
+            self._remember(key, value)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._account_disk(os.path.getsize(path))
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _account_disk(self, added_bytes):
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_bytes += added_bytes
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+
+            # Eviksi berdasarkan ukuran: hapus file terlama sampai 90% batas
+            target = self.max_disk_bytes * 0.9
+            entries = sorted(self._scan_disk())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    def stats(self):
+        """Counter hit/miss cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'memory_hits': self.hits - self.disk_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self._memory)
+        }
+
+    def clear(self):
+        """Kosongkan tier memori dan disk"""
+        with self._lock:
+            self._memory.clear()
+            self._file_digests.clear()
+        if self.disk_dir:
+            for _, _, path in self._scan_disk():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes = 0
@@ -0,0 +1,167 @@
+WORD_LEVEL = 5
+
+# meta['transform'] hasil tanpa perubahan geometri (lihat preprocessing.record_transform)
+IDENTITY_TRANSFORM = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+
+
+def _union_bbox(boxes):
+    x0 = min(x for x, _, _, _ in boxes)
+    y0 = min(y for _, y, _, _ in boxes)
+    x1 = max(x + w for x, _, w, _ in boxes)
+    y1 = max(y + h for _, y, _, h in boxes)
+    return {'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
+
+
+class OCRResult:
+    """Hasil satu kali pass Tesseract (TSV): teks, kata, confidence, baris, blok dan bounding box
+
+    Semua view (text, words, lines, blocks) dibangun dari data yang sama,
+    sehingga Tesseract cukup dijalankan sekali per gambar.
+    """
+
+    def __init__(self, data, lang='eng', meta=None):
+        # data: dict kolom TSV (lihat tesseract_engine.parse_tsv)
+        self.data = data
+        self.lang = lang
+        self.meta = meta or {}
+        self._words = None
+
+    @classmethod
+    def from_dict(cls, value):
+        return cls(value['data'], value.get('lang', 'eng'), value.get('meta'))
+
+    @classmethod
+    def from_pages(cls, pages, lang='eng', meta=None):
+        """Gabungkan hasil per halaman [(nomor halaman, OCRResult)] menjadi satu hasil
+
+        page_num setiap baris diganti nomor halaman dokumen, sehingga view
+        (text, lines, blocks) tetap terpisah per halaman.
+        """
+        data = {}
+        for number, result in pages:
+            for field, values in result.data.items():
+                column = data.setdefault(field, [])
+                if field == 'page_num':
+                    column.extend([number] * len(values))
+                else:
+                    column.extend(values)
+        return cls(data, lang, meta)
+
+    def to_dict(self):
+        """Bentuk JSON-serializable (dipakai cache)"""
+        return {'data': self.data, 'lang': self.lang, 'meta': self.meta}
+
+    @property
+    def words(self):
+        """Daftar kata yang dikenali beserta confidence, posisi dan struktur"""
+        if self._words is None:
+            data = self.data
+            self._words = [
+                {
+                    'text': data['text'][i],
+                    'confidence': data['conf'][i],
+                    'left': data['left'][i],
+                    'top': data['top'][i],
+                    'width': data['width'][i],
+                    'height': data['height'][i],
+                    'page': data['page_num'][i],
+                    'block': data['block_num'][i],
+                    'par': data['par_num'][i],
+                    'line': data['line_num'][i],
+                    'word': data['word_num'][i]
+                }
+                for i in range(len(data['text']))
+                if data['level'][i] == WORD_LEVEL and data['text'][i].strip()
+            ]
+        return self._words
+
+    @property
+    def word_boxes(self):
+        """Kata dalam bentuk kolom numpy (lihat word_boxes.WordBoxes)"""
+        from word_boxes import WordBoxes
+        return WordBoxes.from_result(self)
+
+    @property
+    def boxes(self):
+        """Bounding box (x, y, w, h) setiap kata"""
+        return [(w['left'], w['top'], w['width'], w['height']) for w in self.words]
+
+    def _group(self, key):
+        groups = {}
+        for word in self.words:
+            groups.setdefault(key(word), []).append(word)
+        return groups
+
+    @property
+    def lines(self):
+        """Baris teks dengan bounding box dan rata-rata confidence"""
+        lines = []
+        for (page, block, par, line), words in self._group(
+                lambda w: (w['page'], w['block'], w['par'], w['line'])).items():
+            lines.append({
+                'text': ' '.join(w['text'] for w in words),
+                'page': page,
+                'block': block,
+                'par': par,
+                'line': line,
+                'confidence': round(sum(w['confidence'] for w in words) / len(words), 2),
+                'position': _union_bbox([(w['left'], w['top'], w['width'], w['height'])
+                                         for w in words])
+            })
+        return lines
+
+    @property
+    def blocks(self):
+        """Blok teks dengan bounding box"""
+        blocks = []
+        for (page, block), words in self._group(lambda w: (w['page'], w['block'])).items():
+            lines = self._group_lines(words)
+            blocks.append({
+                'text': '\n'.join(lines),
+                'page': page,
+                'block': block,
+                'position': _union_bbox([(w['left'], w['top'], w['width'], w['height'])
+                                         for w in words])
+            })
+        return blocks
+
+    @staticmethod
+    def _group_lines(words):
+        lines = {}
+        for w in words:
+            lines.setdefault((w['par'], w['line']), []).append(w['text'])
+        return [' '.join(texts) for texts in lines.values()]
+
+    @property
+    def text(self):
+        """Teks polos: kata dipisah spasi, baris dengan newline, paragraf dengan baris kosong"""
+        paragraphs = []
+        for _, words in self._group(lambda w: (w['page'], w['block'], w['par'])).items():
+            lines = {}
+            for w in words:
+                lines.setdefault(w['line'], []).append(w['text'])
+            paragraphs.append('\n'.join(' '.join(texts) for texts in lines.values()))
+        return '\n\n'.join(paragraphs)
+
+    @property
+    def mean_confidence(self):
+        """Rata-rata confidence kata (0 jika tidak ada kata)"""
+        confs = [w['confidence'] for w in self.words if w['confidence'] >= 0]
+        return sum(confs) / len(confs) if confs else 0.0
+
+    def word_details(self, min_confidence=None):
+        """Format lama extract_with_details: text, confidence, position"""
+        return [
+            {
+                'text': w['text'],
+                'confidence': int(w['confidence']),
+                'position': {
+                    'x': w['left'],
+                    'y': w['top'],
+                    'width': w['width'],
+                    'height': w['height']
+                }
+            }
+            for w in self.words
+            if min_confidence is None or w['confidence'] > min_confidence
+        ]
@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from instrumentation import Metrics
+
+
+def _ocr_batch(jobs):
+    """Dijalankan di proses worker: OCR beberapa gambar kecil sekaligus"""
+    import batch_engine
+
+    app = batch_engine._worker_app
+    results = []
+    for data, lang, preprocess, details, deadline in jobs:
+        if deadline is not None and time.time() > deadline:
+            # Client sudah menerima 504: jangan buang waktu worker untuk request ini
+            results.append({'error': 'request expired before processing', 'expired': True})
+            continue
+        try:
+            result = app._recognize_bytes(data, lang=lang, preprocess=preprocess)
+            response = {
+                'text': result.text.strip(),
+                'mean_confidence': round(result.mean_confidence, 2)
+            }
+            if details:
+                response['words'] = result.word_details()
+            results.append(response)
+        except Exception as e:
+            results.append({'error': f"{type(e).__name__}: {e}"})
+    return results
+
+
+class _Job:
+    __slots__ = ('data', 'lang', 'preprocess', 'details', 'deadline', 'future', 'enqueued')
+
+    def __init__(self, data, lang, preprocess, details, deadline=None):
+        self.data = data
+        self.lang = lang
+        self.preprocess = preprocess
+        self.details = details
+        # Waktu wall-clock (time.time) agar bisa dibandingkan di proses worker
+        self.deadline = deadline
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class OCRService:
+    """Layanan OCR lokal dengan micro-batching dan worker pool yang tetap hangat
+
+    Request masuk ke antrean terbatas (max_queue); jika penuh request
+    ditolak (backpressure). Thread batcher menunggu sampai ada worker yang
+    kosong, lalu mengumpulkan request (menunggu paling lama batch_wait_ms)
+    dan mengirimnya sebagai satu task ke process pool. Ukuran batch dibatasi
+    batch_size dan ceil(antrean / worker kosong), sehingga request dibagi ke
+    semua worker yang kosong, bukan ditumpuk pada satu worker.
+
+    Request yang timeout tidak dapat dihentikan jika sudah berjalan di
+    worker; request dalam batch yang sama yang belum mulai dilewati oleh
+    worker setelah deadline-nya lewat.
+
+    close() menolak request baru, lalu menunggu request yang sudah di
+    antrean dan batch yang sedang berjalan selesai sebelum pool ditutup.
+    """
+
+    def __init__(self, workers=None, max_queue=64, batch_size=8, batch_wait_ms=5,
+                 timeout=30.0, app=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.timeout = timeout
+        self.metrics = Metrics()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._slots = threading.Semaphore(self.workers)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        if app is None:
+            from main import OCRApplication
+            app = OCRApplication()
+        from batch_engine import _init_worker
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(app,))
+        self._batcher = threading.Thread(target=self._run_batcher, daemon=True)
+        self._batcher.start()
+
+    def submit(self, data, lang='eng', preprocess=True, details=False, timeout=None):
+        """Masukkan request ke antrean; raise queue.Full jika antrean penuh
+
+        Setelah timeout detik request tidak lagi diproses jika belum dimulai.
+        """
+        if self._stopping.is_set():
+            raise queue.Full
+        deadline = time.time() + timeout if timeout is not None else None
+        job = _Job(data, lang, preprocess, details, deadline)
+        self._queue.put_nowait(job)
+        self.metrics.incr('requests')
+        return job.future
+
+    def _batch_limit(self, collected):
+        """Ukuran batch agar request dalam antrean terbagi rata ke worker kosong"""
+        idle = max(1, self.workers - self._in_flight)
+        waiting = collected + self._queue.qsize()
+        return min(self.batch_size, -(-waiting // idle))
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self._batch_limit(len(batch)):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Request yang sudah timeout/dibatalkan tidak dikirim ke worker
+        return [job for job in batch if job.future.set_running_or_notify_cancel()]
+
+    def _run_batcher(self):
+        # Saat berhenti, antrean yang tersisa tetap dikirim sampai kosong
+        while not self._stopping.is_set() or not self._queue.empty():
+            # Batch baru dikumpulkan setelah ada worker kosong
+            if not self._slots.acquire(timeout=0.2):
+                continue
+            batch = self._collect_batch()
+            if not batch:
+                self._slots.release()
+                continue
+
+            now = time.perf_counter()
+            for job in batch:
+                self.metrics.observe('queue_wait', now - job.enqueued)
+            self.metrics.incr('batches')
+            self.metrics.incr('batched_requests', len(batch))
+            with self._lock:
+                self._in_flight += 1
+
+            payload = [(job.data, job.lang, job.preprocess, job.details, job.deadline)
+                       for job in batch]
+            started = time.perf_counter()
+            try:
+                future = self._pool.submit(_ocr_batch, payload)
+            except Exception as e:
+                self._finish_batch(batch, None, e, started)
+                continue
+            future.add_done_callback(
+                lambda f, batch=batch, started=started: self._finish_batch(
+                    batch, None if f.exception() else f.result(), f.exception(), started))
+
+    def _finish_batch(self, batch, results, error, started):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        self.metrics.observe('batch', time.perf_counter() - started)
+        for i, job in enumerate(batch):
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                if results[i].get('expired'):
+                    self.metrics.incr('expired')
+                job.future.set_result(results[i])
+
+    def health(self):
+        return {
+            'status': 'stopping' if self._stopping.is_set() else 'ok',
+            'workers': self.workers,
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'batches_in_flight': self._in_flight
+        }
+
+    def prometheus(self):
+        text = self.metrics.to_prometheus(prefix='ocr_server')
+        text += "# TYPE ocr_server_queue_depth gauge\n"
+        text += f"ocr_server_queue_depth {self._queue.qsize()}\n"
+        text += "# TYPE ocr_server_batches_in_flight gauge\n"
+        text += f"ocr_server_batches_in_flight {self._in_flight}\n"
+        return text
+
+    def close(self):
+        self._stopping.set()
+        self._batcher.join()
+        self._pool.shutdown(wait=True)
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    """POST /ocr (body = bytes gambar), GET /health, GET /metrics"""
+
+    service = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body) if content_type == 'application/json' else body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send(200, self.service.health())
+        elif path == '/metrics':
+            self._send(200, self.service.prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/ocr':
+            self._send(404, {'error': 'not found'})
+            return
+
+        service = self.service
+        params = parse_qs(url.query)
+        lang = params.get('lang', ['eng'])[0]
+        preprocess = params.get('preprocess', ['1'])[0] not in ('0', 'false')
+        details = params.get('details', ['0'])[0] in ('1', 'true')
+
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else b''
+        if not data:
+            self._send(400, {'error': 'empty body, send image bytes'})
+            return
+        try:
+            timeout = min(float(params.get('timeout', [service.timeout])[0]), service.timeout)
+        except ValueError:
+            timeout = None
+        if timeout is None or not timeout > 0:
+            self._send(400, {'error': 'timeout must be a positive number of seconds'})
+            return
+
+        start = time.perf_counter()
+        try:
+            future = service.submit(data, lang=lang, preprocess=preprocess, details=details,
+                                    timeout=timeout)
+        except queue.Full:
+            service.metrics.incr('rejected')
+            self._send(503, {'error': 'queue full'}, headers={'Retry-After': '1'})
+            return
+
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeout:
+            # Hanya membatalkan request yang belum diambil batcher; yang sudah
+            # di worker dilewati lewat deadline atau selesai tanpa dipakai
+            future.cancel()
+            service.metrics.incr('timeouts')
+            self._send(504, {'error': f'timeout after {timeout}s'})
+            return
+        except Exception as e:
+            service.metrics.record_error('ocr', e)
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        finally:
+            service.metrics.observe('request', time.perf_counter() - start)
+
+        if 'error' in result:
+            service.metrics.incr('failed')
+            self._send(422, result)
+        else:
+            self._send(200, result)
+
+
+class OCRHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Backlog socket lebih besar dari default (5) agar burst koneksi tidak di-reset
+    request_queue_size = 128
+
+
+def serve(host='127.0.0.1', port=8080, **service_options):
+    """Jalankan HTTP server sampai dihentikan (Ctrl+C)"""
+    service = OCRService(**service_options)
+    handler = type('Handler', (OCRRequestHandler,), {'service': service})
+    server = OCRHTTPServer((host, port), handler)
+    print(f"OCR service listening on http://{host}:{server.server_port} "
+          f"({service.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OCR HTTP service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-wait-ms', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    serve(args.host, args.port, workers=args.workers, max_queue=args.max_queue,
+          batch_size=args.batch_size, batch_wait_ms=args.batch_wait_ms, timeout=args.timeout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
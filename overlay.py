@@ -0,0 +1,245 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Warna box per batas bawah confidence (BGR): hijau, oranye, merah
+CONFIDENCE_COLORS = ((80, (0, 200, 0)), (50, (0, 165, 255)), (None, (0, 0, 255)))
+LABEL_COLOR = (0, 0, 255)
+
+MISSING_TRANSFORM = ("No coordinate transform stored for these boxes (written by an older "
+                     "version); re-run the batch with --boxes")
+
+# WordBoxFile yang sudah dibuka di proses worker (memmap, dibuka sekali per file)
+_open_files = {}
+
+
+def _init_renderer():
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(1)
+
+
+def _word_box_file(path):
+    from word_boxes import WordBoxFile
+    if path not in _open_files:
+        _open_files[path] = WordBoxFile(path)
+    return _open_files[path]
+
+
+def draw_boxes(img, word_boxes, min_confidence=None, scale=1.0, color=None, thickness=2,
+               labels=False, label_color=LABEL_COLOR):
+    """Gambar box kata pada img (in-place) dan kembalikan jumlah box
+
+    Filter confidence dan transformasi koordinat dilakukan vektor atas
+    kolom WordBoxes; semua box satu warna digambar dengan satu panggilan
+    cv2.polylines. Jika word_boxes.transform ada (deskew/crop saat OCR),
+    sudut box dipetakan balik ke gambar sumber sehingga box bisa miring.
+    color=None mewarnai box sesuai CONFIDENCE_COLORS. Label teks
+    (labels=True) tetap digambar per kata.
+    """
+    r = word_boxes.records
+    keep = word_boxes.mask(min_confidence)
+    x0 = r['left'].astype(np.float64)
+    y0 = r['top'].astype(np.float64)
+    x1 = x0 + r['width']
+    y1 = y0 + r['height']
+    corners = np.stack([x0, y0, x1, y0, x1, y1, x0, y1], axis=1).reshape(-1, 4, 2)
+    if word_boxes.transform is not None:
+        inverse = cv2.invertAffineTransform(np.asarray(word_boxes.transform, dtype=np.float64))
+        corners = corners @ inverse[:, :2].T + inverse[:, 2]
+    corners = np.rint(corners * scale).astype(np.int32)
+
+    if color is not None:
+        groups = [(keep, color)]
+    else:
+        groups = []
+        remaining = keep.copy()
+        for floor, band_color in CONFIDENCE_COLORS:
+            band = remaining if floor is None else remaining & (r['conf'] >= floor)
+            groups.append((band, band_color))
+            remaining &= ~band
+    for band, band_color in groups:
+        if band.any():
+            cv2.polylines(img, corners[band], True, band_color, thickness)
+
+    if labels:
+        font_scale = 0.5 * scale
+        for i in np.flatnonzero(keep):
+            (x, y) = corners[i, 0]
+            cv2.putText(img, word_boxes.text(i), (int(x), int(y - 10 * scale)),
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, label_color,
+                        max(1, round(2 * scale)))
+    return int(keep.sum())
+
+
+def _output_scale(box_shape, max_dim):
+    if not max_dim:
+        return 1.0
+    return min(1.0, max_dim / max(box_shape))
+
+
+def _fit(img, size):
+    """Resize ke size (w, h) jika berbeda"""
+    if (img.shape[1], img.shape[0]) == size:
+        return img
+    interpolation = cv2.INTER_AREA if size[0] < img.shape[1] else cv2.INTER_LINEAR
+    return cv2.resize(img, size, interpolation=interpolation)
+
+
+def _load_single(source, max_dim):
+    """(gambar BGR ukuran output, skala box) untuk gambar satu halaman
+
+    Gambar di-decode langsung pada resolusi terkecil yang masih cukup
+    untuk ukuran output (IMREAD_REDUCED_*), lalu diskalakan sekali.
+    """
+    from PIL import Image
+    from image_handle import ImageHandle
+
+    with Image.open(source) as img:
+        (width, height) = img.size
+    scale = _output_scale((height, width), max_dim)
+    reduce = 1
+    while reduce < 8 and 1 / (reduce * 2) >= scale:
+        reduce *= 2
+    img = ImageHandle(source, grayscale=False, reduce=reduce).bgr
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return _fit(img, size), scale
+
+
+def _iter_document(source, pages, max_dim):
+    """Yield (page, gambar ukuran output, skala box) untuk halaman yang diminta
+
+    Box dipetakan ke gambar sumber resolusi penuh lewat transform yang
+    tercatat saat OCR (termasuk normalisasi DPI), lalu dikali skala output.
+    """
+    from page_reader import is_multipage, iter_pages
+
+    if not is_multipage(source):
+        img, scale = _load_single(source, max_dim)
+        for page in pages:
+            yield page, img, scale
+        return
+
+    wanted = set(pages)
+    for number, img, _ in iter_pages(source):
+        if number not in wanted:
+            continue
+        scale = _output_scale(img.shape[:2], max_dim)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        size = (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale)))
+        yield number, _fit(img, size), scale
+        wanted.discard(number)
+        if not wanted:
+            break
+
+
+def _resolve(source, base_dir=None):
+    """Path sumber yang bisa dibuka: source relatif digabung dengan base_dir"""
+    if base_dir and not os.path.isabs(source):
+        return os.path.join(base_dir, source)
+    return source
+
+
+def overlay_path(output_dir, source, page, root=None, fmt='jpg'):
+    """Path file overlay: struktur folder sumber (relatif ke root) dipertahankan"""
+    rel = os.path.relpath(source, root) if root else os.path.basename(source)
+    stem = os.path.splitext(rel)[0]
+    return os.path.join(output_dir, f"{stem}_p{page}.{fmt}")
+
+
+def render_document(box_path, docs, output_dir, root=None, base_dir=None, min_confidence=None,
+                    max_dim=None, labels=False, fmt='jpg', quality=90):
+    """Render overlay semua halaman satu dokumen sumber (dipakai worker)
+
+    docs berisi nomor dokumen di file .wbx box_path yang sumbernya sama,
+    sehingga PDF/TIFF hanya dibaca sekali. Source relatif dibuka dari
+    base_dir. Mengembalikan list dict (source, page, output, boxes, error)
+    per halaman; halaman tanpa transform tercatat gagal.
+    """
+    boxes_file = _word_box_file(box_path)
+    by_page = {}
+    results = []
+    for doc in docs:
+        source, page, word_boxes = boxes_file.document(doc)
+        if word_boxes.transform is None:
+            # File .wbx lama: skala/deskew saat OCR tidak diketahui
+            results.append({'source': source, 'page': page, 'output': '', 'boxes': 0,
+                            'error': MISSING_TRANSFORM})
+            continue
+        by_page[page] = word_boxes
+    if not by_page:
+        return results
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if fmt in ('jpg', 'jpeg') else []
+
+    path = _resolve(source, base_dir)
+    try:
+        for page, img, scale in _iter_document(path, sorted(by_page), max_dim):
+            output = overlay_path(output_dir, path, page, root, fmt)
+            thickness = 2 if scale >= 0.5 else 1
+            count = draw_boxes(img, by_page[page], min_confidence, scale=scale,
+                               thickness=thickness, labels=labels)
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            if not cv2.imwrite(output, img, params):
+                raise OSError(f"Cannot write {output}")
+            del by_page[page]
+            results.append({'source': source, 'page': page, 'output': output,
+                            'boxes': count, 'error': ''})
+        error = 'Page not found in source'
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    # Halaman yang belum ter-render dicatat sebagai gagal
+    results.extend({'source': source, 'page': page, 'output': '', 'boxes': 0, 'error': error}
+                   for page in sorted(by_page))
+    return results
+
+
+def _document_groups(box_paths):
+    """(path .wbx, [nomor dokumen]) per file sumber berurutan"""
+    for box_path in box_paths:
+        documents = _word_box_file(box_path).documents
+        group = []
+        for doc, document in enumerate(documents):
+            if group and documents[group[-1]][0] != document[0]:
+                yield box_path, group
+                group = []
+            group.append(doc)
+        if group:
+            yield box_path, group
+
+
+def common_root(box_paths, base_dir=None):
+    """Folder induk bersama semua sumber di file .wbx (untuk nama file output)"""
+    folders = {os.path.dirname(os.path.abspath(_resolve(document[0], base_dir)))
+               for box_path in box_paths
+               for document in _word_box_file(box_path).documents}
+    return os.path.commonpath(sorted(folders)) if folders else None
+
+
+def render_overlays(box_paths, output_dir, min_confidence=None, max_dim=None,
+                    labels=False, fmt='jpg', workers=None, base_dir=None):
+    """Render overlay box kata untuk semua halaman di file .wbx secara paralel
+
+    Box diambil dari hasil yang tersimpan (batch --boxes), tanpa OCR ulang.
+    max_dim membatasi sisi terpanjang output (thumbnail QA). base_dir
+    adalah folder asal path sumber relatif (folder kerja saat batch).
+    Generator yang menghasilkan dict per halaman begitu dokumennya selesai.
+    """
+    from batch_engine import bounded_map
+
+    workers = workers or os.cpu_count() or 1
+    root = common_root(box_paths, base_dir)
+    options = (output_dir, root, base_dir, min_confidence, max_dim, labels, fmt)
+    tasks = ((box_path, docs, *options) for box_path, docs in _document_groups(box_paths))
+
+    if workers == 1:
+        for task in tasks:
+            yield from render_document(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer) as pool:
+        for results in bounded_map(pool, render_document, tasks, max_inflight=workers * 4,
+                                   ordered=False):
+            yield from results
@@ -0,0 +1,113 @@
+import os
+import cv2
+import numpy as np
+
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+PDF_EXTENSIONS = ('.pdf',)
+MULTIPAGE_EXTENSIONS = TIFF_EXTENSIONS + PDF_EXTENSIONS
+
+
+def _pil_to_bgr(frame):
+    """Frame PIL menjadi array BGR/grayscale (konvensi cv2)"""
+    if frame.mode in ('1', 'L', 'I;16', 'I'):
+        return np.asarray(frame.convert('L'))
+    rgb = np.asarray(frame.convert('RGB'))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def _frame_dpi(frame):
+    dpi = frame.info.get('dpi')
+    if dpi and dpi[0]:
+        return float(dpi[0])
+    return None
+
+
+def page_count(path):
+    """Jumlah halaman dokumen (hanya membaca header/struktur, bukan piksel)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TIFF_EXTENSIONS:
+        from PIL import Image
+        with Image.open(path) as img:
+            return getattr(img, 'n_frames', 1)
+    if ext in PDF_EXTENSIONS:
+        try:
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+        except ImportError:
+            from pdf2image import pdfinfo_from_path
+            return int(pdfinfo_from_path(path)['Pages'])
+    return 1
+
+
+def is_multipage(path):
+    """True untuk PDF dan TIFF dengan lebih dari satu halaman"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        return True
+    if ext in TIFF_EXTENSIONS:
+        return page_count(path) > 1
+    return False
+
+
+def _iter_tiff(path):
+    from PIL import Image
+    with Image.open(path) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            # seek hanya men-decode frame aktif
+            img.seek(index)
+            yield index + 1, _pil_to_bgr(img), _frame_dpi(img)
+
+
+def _iter_pdf(path, dpi):
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            for index in range(len(pdf)):
+                page = pdf[index]
+                bitmap = page.render(scale=dpi / 72)
+                # pdfium merender BGR(A), sama dengan konvensi cv2; disalin
+                # karena buffer bitmap dibebaskan saat close()
+                bgr = bitmap.to_numpy()[:, :, :3].copy()
+                bitmap.close()
+                yield index + 1, bgr, float(dpi)
+                page.close()
+        finally:
+            pdf.close()
+        return
+
+    try:
+        from pdf2image import convert_from_path
+    except ImportError:
+        raise ImportError("PDF membutuhkan pypdfium2 atau pdf2image (poppler)")
+
+    # Render satu halaman per panggilan agar memori tetap terbatas
+    for number in range(1, page_count(path) + 1):
+        frame = convert_from_path(path, dpi=dpi, first_page=number, last_page=number)[0]
+        yield number, _pil_to_bgr(frame), float(dpi)
+
+
+def iter_pages(path, dpi=300):
+    """Generator (nomor halaman, array gambar, dpi) satu halaman per langkah
+
+    TIFF multi-halaman dibaca per frame, PDF dirender per halaman pada dpi,
+    gambar biasa menghasilkan satu halaman.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TIFF_EXTENSIONS:
+        yield from _iter_tiff(path)
+    elif ext in PDF_EXTENSIONS:
+        yield from _iter_pdf(path, dpi)
+    else:
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError("Gambar tidak dapat dibaca")
+        yield 1, img, None
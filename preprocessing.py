@@ -0,0 +1,296 @@
+import time
+import cv2
+import numpy as np
+
+
+def compose_transform(transform, matrix):
+    """Affine 2x3 (koordinat input -> output): matrix diterapkan setelah transform
+
+    transform None berarti identitas; hasil berupa list (JSON-serializable).
+    """
+    m = np.vstack([np.asarray(matrix, dtype=np.float64), (0, 0, 1)])
+    if transform is not None:
+        m = m @ np.vstack([np.asarray(transform, dtype=np.float64), (0, 0, 1)])
+    return m[:2].tolist()
+
+
+def record_transform(context, matrix):
+    context['transform'] = compose_transform(context.get('transform'), matrix)
+
+
+class Stage:
+    """Satu langkah preprocessing
+
+    apply() mengembalikan gambar baru, atau None jika langkah tidak
+    berefek pada gambar ini (gambar input dipakai apa adanya). Stage yang
+    mengubah geometri mencatatnya di context['transform'] (record_transform)
+    agar box hasil OCR dapat dipetakan kembali ke gambar sebelum pipeline.
+    """
+
+    name = 'stage'
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def apply(self, img, context):
+        raise NotImplementedError
+
+    def config(self):
+        """Parameter stage dalam bentuk string (bagian dari signature pipeline)"""
+        return ''
+
+
+class Grayscale(Stage):
+    name = 'grayscale'
+
+    def apply(self, img, context):
+        if img.ndim == 2:
+            return None
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+class Denoise(Stage):
+    name = 'denoise'
+
+    def __init__(self, ksize=3, enabled=True):
+        super().__init__(enabled)
+        self.ksize = ksize
+
+    def apply(self, img, context):
+        if self.ksize <= 1:
+            return None
+        return cv2.medianBlur(img, self.ksize)
+
+    def config(self):
+        return f"median{self.ksize}"
+
+
+class Threshold(Stage):
+    """Binarisasi: 'otsu', 'adaptive' (gaussian) atau 'fixed'"""
+
+    name = 'threshold'
+
+    def __init__(self, method='otsu', value=127, block_size=31, c=10, enabled=True):
+        super().__init__(enabled)
+        if method not in ('otsu', 'adaptive', 'fixed'):
+            raise ValueError(f"Metode threshold tidak dikenal: {method}")
+        self.method = method
+        self.value = value
+        self.block_size = block_size
+        self.c = c
+
+    def apply(self, img, context):
+        if self.method == 'otsu':
+            _, thresh = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        elif self.method == 'adaptive':
+            thresh = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY, self.block_size, self.c)
+        else:
+            _, thresh = cv2.threshold(img, self.value, 255, cv2.THRESH_BINARY)
+        return thresh
+
+    def config(self):
+        if self.method == 'adaptive':
+            return f"adaptive{self.block_size},{self.c}"
+        if self.method == 'fixed':
+            return f"fixed{self.value}"
+        return 'otsu'
+
+
+def estimate_skew(thresh, max_dim=1024):
+    """Estimasi sudut kemiringan (derajat) dari gambar biner
+
+    Gambar diperkecil ke sisi terpanjang max_dim sebelum piksel teks
+    dikumpulkan, sehingga biaya tidak bergantung pada DPI.
+    """
+    (h, w) = thresh.shape[:2]
+    scale = max_dim / max(h, w)
+    if scale < 1:
+        small = cv2.resize(thresh, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = thresh
+
+    # Piksel teks = kelas minoritas (teks gelap di latar terang setelah Otsu)
+    mask = small > 127
+    if np.count_nonzero(mask) > mask.size // 2:
+        mask = ~mask
+    coords = cv2.findNonZero(mask.view(np.uint8))
+    if coords is None or len(coords) < 10:
+        return 0.0
+
+    angle = cv2.minAreaRect(coords)[-1]
+
+    # Normalisasi ke (-45, 45], berlaku untuk kedua konvensi sudut OpenCV
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    return angle
+
+
+class Deskew(Stage):
+    """Rotasi otomatis; dilewati jika kemiringan di bawah min_angle derajat"""
+
+    name = 'deskew'
+
+    def __init__(self, min_angle=0.5, max_dim=1024, enabled=True):
+        super().__init__(enabled)
+        self.min_angle = min_angle
+        self.max_dim = max_dim
+
+    def apply(self, img, context):
+        angle = estimate_skew(img, self.max_dim)
+        context['skew_angle'] = angle
+        if abs(angle) < self.min_angle:
+            return None
+
+        (h, w) = img.shape[:2]
+        center = (w // 2, h // 2)
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        record_transform(context, M)
+        return cv2.warpAffine(img, M, (w, h),
+                              flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def config(self):
+        return f"{self.min_angle},{self.max_dim}"
+
+
+class RescaleDPI(Stage):
+    """Skala ulang ke target_dpi; DPI sumber dari source_dpi atau context['dpi']"""
+
+    name = 'rescale'
+
+    def __init__(self, target_dpi=300, source_dpi=None, tolerance=0.05, enabled=True):
+        super().__init__(enabled)
+        self.target_dpi = target_dpi
+        self.source_dpi = source_dpi
+        self.tolerance = tolerance
+
+    def apply(self, img, context):
+        source_dpi = self.source_dpi or context.get('dpi')
+        if not source_dpi:
+            return None
+        factor = self.target_dpi / source_dpi
+        if abs(factor - 1) <= self.tolerance:
+            return None
+
+        (h, w) = img.shape[:2]
+        size = (max(1, round(w * factor)), max(1, round(h * factor)))
+        interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+        context['dpi'] = self.target_dpi
+        record_transform(context, [[size[0] / w, 0, 0], [0, size[1] / h, 0]])
+        return cv2.resize(img, size, interpolation=interpolation)
+
+    def config(self):
+        return f"{self.target_dpi},{self.source_dpi}"
+
+
+class BorderCrop(Stage):
+    """Potong tepi kosong di sekitar konten, menyisakan margin piksel"""
+
+    name = 'crop'
+
+    def __init__(self, margin=10, enabled=True):
+        super().__init__(enabled)
+        self.margin = margin
+
+    def apply(self, img, context):
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # Konten = piksel yang lebih gelap dari latar
+        coords = cv2.findNonZero((gray < 128).view(np.uint8))
+        if coords is None:
+            return None
+
+        x, y, w, h = cv2.boundingRect(coords)
+        (img_h, img_w) = img.shape[:2]
+        x0, y0 = max(0, x - self.margin), max(0, y - self.margin)
+        x1, y1 = min(img_w, x + w + self.margin), min(img_h, y + h + self.margin)
+        if (x0, y0, x1, y1) == (0, 0, img_w, img_h):
+            return None
+        context['crop_offset'] = (x0, y0)
+        record_transform(context, [[1, 0, -x0], [0, 1, -y0]])
+        return img[y0:y1, x0:x1]
+
+    def config(self):
+        return str(self.margin)
+
+
+class PreprocessPipeline:
+    """Rangkaian stage preprocessing dengan waktu dan ukuran alokasi per stage
+
+    last_stats berisi catatan run terakhir, totals berisi akumulasi
+    (jumlah run, jumlah skip, detik) per stage.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.last_stats = []
+        self.totals = {}
+
+    def signature(self):
+        """Identitas konfigurasi pipeline (dipakai sebagai bagian cache key)"""
+        return '|'.join(f"{stage.name}({stage.config()})"
+                        for stage in self.stages if stage.enabled)
+
+    def run(self, img, context=None, metrics=None):
+        """Jalankan semua stage aktif secara berurutan
+
+        metrics (instrumentation.Metrics) opsional menerima timer
+        'preprocess.<stage>' dan counter 'preprocess.<stage>.skipped'.
+        """
+        context = {} if context is None else context
+        stats = []
+        for stage in self.stages:
+            if not stage.enabled:
+                continue
+            start = time.perf_counter()
+            out = stage.apply(img, context)
+            elapsed = time.perf_counter() - start
+
+            skipped = out is None
+            if not skipped:
+                img = out
+            stats.append({
+                'stage': stage.name,
+                'seconds': elapsed,
+                'bytes': 0 if skipped else out.nbytes,
+                'skipped': skipped
+            })
+
+            total = self.totals.setdefault(stage.name, {'runs': 0, 'skipped': 0, 'seconds': 0.0})
+            total['runs'] += 1
+            total['skipped'] += skipped
+            total['seconds'] += elapsed
+            if metrics is not None and metrics.enabled:
+                metrics.observe(f"preprocess.{stage.name}", elapsed)
+                if skipped:
+                    metrics.incr(f"preprocess.{stage.name}.skipped")
+
+        self.last_stats = stats
+        return img
+
+    def get_stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+
+def default_pipeline(deskew_min_angle=0.5, deskew_max_dim=1024):
+    """Pipeline standar: grayscale, median blur, Otsu, deskew"""
+    return PreprocessPipeline([
+        Grayscale(),
+        Denoise(3),
+        Threshold('otsu'),
+        Deskew(deskew_min_angle, deskew_max_dim)
+    ])
+
+
+def fast_pipeline():
+    """Pipeline ringan: grayscale dan Otsu saja"""
+    return PreprocessPipeline([
+        Grayscale(),
+        Threshold('otsu')
+    ])
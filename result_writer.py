@@ -0,0 +1,164 @@
+import os
+import csv
+import json
+
+
+class StreamingResultWriter:
+    """Tulis hasil OCR ke CSV/JSONL secara bertahap dengan manifest checkpoint
+
+    Hasil ditulis per chunk (chunk_size record). Setelah chunk ditulis dan
+    di-fsync, path file sumbernya dicatat di manifest, sehingga run ulang
+    dapat melewati file yang sudah selesai. Fungsi di checkpoint_hooks
+    (mis. checkpoint file word box) dipanggil sebelum manifest ditulis,
+    sehingga manifest tidak pernah mendahului data pendampingnya.
+    """
+
+    def __init__(self, output_path, fieldnames, chunk_size=100, resume=True,
+                 manifest_path=None):
+        self.output_path = output_path
+        self.fieldnames = list(fieldnames)
+        self.chunk_size = max(1, chunk_size)
+        self.manifest_path = manifest_path or output_path + '.manifest'
+        self.format = 'jsonl' if output_path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        if not resume:
+            for path in (self.output_path, self.manifest_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self._buffer = []
+        self._keys = []
+        self.rows_written = 0
+        self.checkpoint_hooks = []
+
+        write_header = self.format == 'csv' and not self._has_content(output_path)
+        if self.format == 'csv' and not write_header:
+            # Lanjutkan file lama dengan kolom sesuai header yang sudah ada
+            self.fieldnames = read_header(output_path) or self.fieldnames
+        self._out = open(output_path, 'a', newline='', encoding='utf-8')
+        self._manifest = open(self.manifest_path, 'a', encoding='utf-8')
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._out, fieldnames=self.fieldnames,
+                                       extrasaction='ignore')
+            if write_header:
+                self._csv.writeheader()
+
+    @staticmethod
+    def _has_content(path):
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def completed(self):
+        """Set path yang sudah tercatat di manifest"""
+        return read_manifest(self.manifest_path)
+
+    def write(self, record, key=None):
+        """Tambahkan satu hasil, flush otomatis jika chunk penuh
+
+        key (path sumber) dicatat di manifest setelah record ini tersimpan;
+        untuk dokumen multi-halaman cukup diberikan pada halaman terakhir.
+        """
+        self._buffer.append(record)
+        if key is not None:
+            self._keys.append(key)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Tulis buffer ke output lalu catat key-nya di manifest"""
+        if not self._buffer:
+            return
+
+        if self.format == 'csv':
+            self._csv.writerows(self._buffer)
+        else:
+            for record in self._buffer:
+                row = {field: record.get(field) for field in self.fieldnames}
+                self._out.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._out.flush()
+        os.fsync(self._out.fileno())
+
+        # Manifest ditulis setelah output (dan data pendamping) aman di disk
+        for hook in self.checkpoint_hooks:
+            hook()
+        self._manifest.write(''.join(key + '\n' for key in self._keys))
+        self._manifest.flush()
+        os.fsync(self._manifest.fileno())
+
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+        self._keys = []
+
+    def close(self):
+        self.flush()
+        self._out.close()
+        self._manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def read_header(csv_path):
+    """Nama kolom dari baris pertama file CSV"""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+
+def iter_records(path):
+    """Generator record (dict) dari file hasil CSV atau JSONL"""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _row_key(record):
+    source = record.get('path') or record.get('filename')
+    return source, str(record.get('page'))
+
+
+def merge_results(input_paths, output_path, fieldnames, chunk_size=1000):
+    """Gabungkan output beberapa shard/run menjadi satu file
+
+    Record digabung secara streaming; untuk baris ganda (path/filename, page)
+    dari run yang di-resume, shard yang tumpang tindih atau file yang diubah
+    (watch) hanya kemunculan terakhir yang ditulis. Pass pertama hanya
+    mencatat posisi terakhir setiap key, sehingga memori sebanding dengan
+    jumlah key, bukan isi record. Manifest output ikut dibuat sehingga hasil
+    gabungan bisa di-resume; file sumber yang baris terakhirnya gagal tidak
+    dicatat sehingga dicoba lagi. Mengembalikan jumlah baris yang ditulis.
+    """
+    last = {}
+    for file_index, input_path in enumerate(input_paths):
+        for row, record in enumerate(iter_records(input_path)):
+            last[_row_key(record)] = (file_index, row, bool(record.get('error')))
+    failed = {row_key[0] for row_key, (_, _, error) in last.items() if error}
+
+    keyed = set()
+    with StreamingResultWriter(output_path, fieldnames, chunk_size=chunk_size,
+                               resume=False) as writer:
+        for file_index, input_path in enumerate(input_paths):
+            for row, record in enumerate(iter_records(input_path)):
+                row_key = _row_key(record)
+                if last[row_key][:2] != (file_index, row):
+                    continue
+                # Key manifest dicatat sekali per file sumber
+                source = row_key[0]
+                new_source = source not in keyed and source not in failed
+                keyed.add(source)
+                writer.write(record, key=source if new_source and record.get('path') else None)
+    return writer.rows_written
+
+
+def read_manifest(manifest_path):
+    """Baca manifest checkpoint menjadi set path"""
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
@@ -0,0 +1,236 @@
+import io
+import os
+import sys
+import shlex
+import subprocess
+import threading
+
+TSV_INT_FIELDS = ('level', 'page_num', 'block_num', 'par_num', 'line_num',
+                  'word_num', 'left', 'top', 'width', 'height')
+TSV_FIELDS = TSV_INT_FIELDS + ('conf', 'text')
+
+
+class TesseractError(RuntimeError):
+    """Tesseract gagal memproses gambar"""
+
+
+def default_tesseract_cmd():
+    """Path Tesseract: env TESSERACT_CMD, lalu setting pytesseract (jika sudah diimport)
+
+    pytesseract tidak diimport di sini agar start-up tetap ringan.
+    """
+    if os.environ.get('TESSERACT_CMD'):
+        return os.environ['TESSERACT_CMD']
+    pytesseract = sys.modules.get('pytesseract')
+    if pytesseract is not None:
+        return pytesseract.pytesseract.tesseract_cmd
+    return 'tesseract'
+
+
+def parse_tsv(tsv_text):
+    """Parse output TSV Tesseract menjadi dict kolom (format seperti pytesseract Output.DICT)"""
+    data = {field: [] for field in TSV_FIELDS}
+    for line in tsv_text.splitlines():
+        parts = line.split('\t')
+        if len(parts) < len(TSV_FIELDS) - 1 or parts[0] == 'level':
+            continue
+        if len(parts) == len(TSV_FIELDS) - 1:
+            parts.append('')
+        for field, value in zip(TSV_INT_FIELDS, parts):
+            data[field].append(int(value))
+        data['conf'].append(float(parts[10]))
+        data['text'].append(parts[11])
+    return data
+
+
+def encode_image(image):
+    """Ubah input (path, bytes, numpy array, PIL Image) menjadi bytes gambar di memori"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, (str, os.PathLike)):
+        # File yang sudah ada dikirim apa adanya, tanpa decode
+        with open(image, 'rb') as f:
+            return f.read()
+
+    import numpy as np
+    if not isinstance(image, np.ndarray):
+        # PIL Image: RGB -> BGR agar sesuai konvensi cv2
+        image = np.asarray(image.convert('RGB') if image.mode not in ('L', 'RGB') else image)
+        if image.ndim == 3:
+            image = image[:, :, ::-1]
+
+    import cv2
+    ok, buffer = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise TesseractError("Gambar tidak dapat di-encode")
+    return buffer.tobytes()
+
+
+class _PipeBackend:
+    """Jalankan CLI Tesseract dengan gambar lewat stdin dan hasil lewat stdout
+
+    Setiap gambar memulai proses baru yang memuat ulang traineddata; hanya
+    dipakai jika tesserocr tidak tersedia (mis. Windows) atau diminta.
+    """
+
+    name = 'pipe'
+
+    def __init__(self, tesseract_cmd=None, timeout=None):
+        self.tesseract_cmd = tesseract_cmd
+        self.timeout = timeout
+        self._version = None
+
+    def run(self, image, lang, config, tsv):
+        cmd = [self.tesseract_cmd or default_tesseract_cmd(), 'stdin', 'stdout', '-l', lang]
+        cmd += shlex.split(config)
+        if tsv:
+            cmd.append('tsv')
+
+        proc = subprocess.run(cmd, input=encode_image(image), stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, timeout=self.timeout)
+        if proc.returncode != 0:
+            raise TesseractError(proc.stderr.decode('utf-8', 'replace').strip())
+        return proc.stdout.decode('utf-8', 'replace')
+
+    def warmup(self, langs):
+        pass
+
+    def version(self):
+        """Baris pertama `tesseract --version` (dibaca sekali)"""
+        if self._version is None:
+            try:
+                proc = subprocess.run([self.tesseract_cmd or default_tesseract_cmd(), '--version'],
+                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                      timeout=10)
+                self._version = proc.stdout.decode('utf-8', 'replace').splitlines()[0].strip()
+            except (OSError, IndexError, subprocess.SubprocessError):
+                self._version = 'unknown'
+        return self._version
+
+
+class _TesserocrBackend:
+    """Pakai API Tesseract in-process (tesserocr), satu instance per bahasa per thread
+
+    traineddata hanya dimuat sekali, tidak ada proses baru per gambar.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+        # Bahasa yang ditemukan di tessdata tesserocr (bisa berbeda dari CLI)
+        (_, self.languages) = tesserocr.get_languages()
+
+    def _api(self, lang):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(lang)
+        if api is None:
+            api = apis[lang] = self._tesserocr.PyTessBaseAPI(lang=lang)
+        return api
+
+    def _configure(self, api, config):
+        api.SetPageSegMode(self._tesserocr.PSM.AUTO)
+        args = shlex.split(config)
+        for i, arg in enumerate(args):
+            if arg == '--psm' and i + 1 < len(args):
+                api.SetPageSegMode(int(args[i + 1]))
+            elif arg == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+                name, value = args[i + 1].split('=', 1)
+                api.SetVariable(name, value)
+
+    def _set_image(self, api, image):
+        import numpy as np
+        if isinstance(image, np.ndarray):
+            if image.ndim == 3:
+                image = np.ascontiguousarray(image[:, :, ::-1])
+            height, width = image.shape[:2]
+            bpp = 1 if image.ndim == 2 else image.shape[2]
+            api.SetImageBytes(image.tobytes(), width, height, bpp, width * bpp)
+            return
+
+        from PIL import Image
+        if not isinstance(image, Image.Image):
+            image = Image.open(io.BytesIO(encode_image(image)))
+        api.SetImage(image)
+
+    def run(self, image, lang, config, tsv):
+        api = self._api(lang)
+        self._configure(api, config)
+        self._set_image(api, image)
+        if tsv:
+            api.Recognize()
+            return api.GetTSVText(0)
+        return api.GetUTF8Text()
+
+    def warmup(self, langs):
+        for lang in langs:
+            self._api(lang)
+
+    def version(self):
+        """Versi library Tesseract yang di-link tesserocr (bisa berbeda dari CLI)"""
+        return self._tesserocr.tesseract_version().splitlines()[0].strip()
+
+
+class TesseractEngine:
+    """Lapisan transport Tesseract tanpa file sementara
+
+    backend='tesserocr' memakai API in-process yang tetap hangat per bahasa,
+    backend='pipe' mengirim gambar lewat stdin/stdout ke CLI Tesseract,
+    backend='auto' memilih tesserocr jika terpasang (ada di requirements
+    kecuali Windows) dan tessdata-nya ditemukan, selain itu CLI.
+    """
+
+    def __init__(self, backend='auto', tesseract_cmd=None, timeout=None):
+        self.backend_name = backend
+        self.tesseract_cmd = tesseract_cmd
+        self.timeout = timeout
+        self._backend = self._create_backend()
+
+    def _create_backend(self):
+        if self.backend_name in ('auto', 'tesserocr'):
+            try:
+                backend = _TesserocrBackend()
+                if backend.languages or self.backend_name == 'tesserocr':
+                    return backend
+                # tesserocr terpasang tanpa tessdata: CLI tetap bisa dipakai
+            except ImportError:
+                if self.backend_name == 'tesserocr':
+                    raise
+        return _PipeBackend(self.tesseract_cmd, self.timeout)
+
+    # Backend dibuat ulang di proses worker
+    def __getstate__(self):
+        return {
+            'backend_name': self.backend_name,
+            'tesseract_cmd': self.tesseract_cmd,
+            'timeout': self.timeout
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._backend = self._create_backend()
+
+    @property
+    def backend(self):
+        return self._backend.name
+
+    @property
+    def version(self):
+        """Identitas Tesseract yang benar-benar dipakai backend aktif (untuk cache key)"""
+        return f"{self._backend.name} {self._backend.version()}"
+
+    def warmup(self, langs=('eng',)):
+        """Muat traineddata bahasa lebih awal (hanya berefek pada backend tesserocr)"""
+        self._backend.warmup(langs)
+
+    def image_to_string(self, image, lang='eng', config=''):
+        """OCR gambar menjadi teks"""
+        return self._backend.run(image, lang, config, tsv=False)
+
+    def image_to_data(self, image, lang='eng', config=''):
+        """OCR gambar menjadi data per kata (dict kolom TSV)"""
+        return parse_tsv(self._backend.run(image, lang, config, tsv=True))
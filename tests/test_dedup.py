@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from dedup import Deduplicator, hamming
+
+LINES = [f"invoice total amount {1000 + 37 * i}" for i in range(20)]
+
+
+def _page(lines):
+    img = np.full((2200, 1700), 255, np.uint8)
+    for i, text in enumerate(lines):
+        cv2.putText(img, text, (120, 150 + 55 * i), cv2.FONT_HERSHEY_SIMPLEX,
+                    1.3, 0, 3, cv2.LINE_AA)
+    return img
+
+
+def _rescan(img):
+    (h, w) = img.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), 1.5, 1.03)
+    M[:, 2] += (12, -8)
+    out = cv2.warpAffine(img, M, (w, h), borderValue=255)
+    noise = np.random.RandomState(0).normal(0, 8, out.shape)
+    return np.clip(out * 0.9 + 20 + noise, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def pages(tmp_path):
+    original = _page(LINES)
+    edited = _page(LINES[:7] + [LINES[7].replace('1259', '1258')] + LINES[8:])
+    paths = {}
+    for name, img, ext in (('original', original, '.png'),
+                           ('resaved', original, '.jpg'),
+                           ('rescan', _rescan(original), '.jpg'),
+                           ('edited', edited, '.png')):
+        paths[name] = str(tmp_path / (name + ext))
+        cv2.imwrite(paths[name], img, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return paths
+
+
+def test_resave_and_rescan_are_candidates_and_confirmed(pages):
+    dedup = Deduplicator()
+    original = dedup.hash_file(pages['original'])
+    dedup.add('original', original, pages['original'])
+    for name in ('resaved', 'rescan'):
+        value = dedup.hash_file(pages[name])
+        assert hamming(original, value) <= dedup.threshold
+        assert dedup.match(value, pages[name]) == 'original'
+
+
+def test_one_digit_edit_is_rejected(pages):
+    dedup = Deduplicator()
+    dedup.add('original', dedup.hash_file(pages['original']), pages['original'])
+    value = dedup.hash_file(pages['edited'])
+    assert dedup.match(value, pages['edited']) is None
+    assert dedup.stats()['rejected'] == 1
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from watcher import FolderWatcher, WatchManifest
+
+
+def _start(folder, output):
+    """Watcher baru (seperti restart) tanpa OCR: hanya deteksi perubahan"""
+    watcher = FolderWatcher(None, str(folder), str(output), settle=0)
+    watcher.manifest = WatchManifest(watcher.manifest_path)
+    watcher.load_batch_manifest(str(output) + '.manifest')
+    return watcher
+
+
+def _write_image(path, data=b'image'):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_batch_done_file_is_not_reprocessed(tmp_path):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    image = folder / 'a.png'
+    _write_image(image)
+    output = tmp_path / 'results.csv'
+    time.sleep(0.01)
+    (tmp_path / 'results.csv.manifest').write_text(str(image) + '\n', encoding='utf-8')
+
+    watcher = _start(folder, output)
+    watcher.scan(full=True)
+    assert not watcher._pending
+    assert watcher.manifest.get(str(image)) is not None
+    watcher.manifest.close()
+
+
+def test_recreated_file_is_processed_after_restart(tmp_path):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    image = folder / 'a.png'
+    _write_image(image)
+    output = tmp_path / 'results.csv'
+    time.sleep(0.01)
+    (tmp_path / 'results.csv.manifest').write_text(str(image) + '\n', encoding='utf-8')
+
+    # Run pertama: file dari batch dicatat, lalu dihapus
+    watcher = _start(folder, output)
+    watcher.scan(full=True)
+    os.remove(image)
+    watcher.scan(full=True)
+    assert watcher.manifest.get(str(image)) is None
+    watcher.manifest.close()
+
+    # File dibuat ulang di path yang sama, watcher di-restart
+    _write_image(image, b'new image')
+    watcher = _start(folder, output)
+    watcher.scan(full=True)
+    assert str(image) in watcher._pending
+    watcher.manifest.close()
+
+
+def test_file_changed_after_batch_is_processed(tmp_path):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    image = folder / 'a.png'
+    output = tmp_path / 'results.csv'
+    (tmp_path / 'results.csv.manifest').write_text(str(image) + '\n', encoding='utf-8')
+    time.sleep(0.01)
+    # Ditulis ulang saat watcher tidak berjalan, setelah manifest batch
+    _write_image(image, b'edited')
+
+    watcher = _start(folder, output)
+    watcher.scan(full=True)
+    assert str(image) in watcher._pending
+    watcher.manifest.close()
@@ -0,0 +1,245 @@
+import re
+import sqlite3
+from array import array
+from collections import OrderedDict
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    UNIQUE (path, page)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    boxes BLOB NOT NULL,
+    PRIMARY KEY (term_id, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+
+def tokenize(text):
+    """Pecah teks menjadi term huruf kecil (huruf/angka saja)"""
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+class TextIndex:
+    """Inverted index persisten (SQLite): term -> dokumen, halaman, posisi dan box kata
+
+    Posting per (term, dokumen) menyimpan posisi kata (uint32) dan box
+    x, y, w, h (int32) sebagai blob biner. Dokumen yang diindeks ulang
+    menggantikan posting lamanya, sehingga index bisa diperbarui bertahap.
+    Id term yang sering dipakai di-cache (LRU, max_cached_terms entry).
+    """
+
+    def __init__(self, path, commit_every=500, max_cached_terms=100000):
+        self.path = path
+        self.commit_every = commit_every
+        self.max_cached_terms = max_cached_terms
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._term_ids = OrderedDict()
+        self._pending = 0
+
+    def _term_id(self, term, create=True):
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            self._term_ids.move_to_end(term)
+            return term_id
+        row = self.conn.execute('SELECT id FROM terms WHERE term = ?', (term,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            row = (self.conn.execute('INSERT INTO terms (term) VALUES (?)', (term,)).lastrowid,)
+        self._term_ids[term] = row[0]
+        if len(self._term_ids) > self.max_cached_terms:
+            self._term_ids.popitem(last=False)
+        return row[0]
+
+    def add(self, path, page, words):
+        """Indeks satu halaman; words berupa iterable (teks, (x, y, w, h)) dalam urutan baca"""
+        conn = self.conn
+        row = conn.execute('SELECT id FROM docs WHERE path = ? AND page = ?',
+                           (path, page)).fetchone()
+        if row is None:
+            doc_id = conn.execute('INSERT INTO docs (path, page) VALUES (?, ?)',
+                                  (path, page)).lastrowid
+        else:
+            doc_id = row[0]
+            conn.execute('DELETE FROM postings WHERE doc_id = ?', (doc_id,))
+
+        postings = {}
+        position = 0
+        for text, box in words:
+            for token in tokenize(text):
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = (array('I'), array('i'))
+                entry[0].append(position)
+                entry[1].extend(box)
+                position += 1
+
+        conn.executemany(
+            'INSERT INTO postings (term_id, doc_id, positions, boxes) VALUES (?, ?, ?, ?)',
+            [(self._term_id(term), doc_id, positions.tobytes(), boxes.tobytes())
+             for term, (positions, boxes) in postings.items()])
+
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+        return doc_id
+
+    def add_word_boxes(self, path, page, word_boxes):
+        """Indeks WordBoxes satu halaman (lihat word_boxes.py)"""
+        r = word_boxes.records
+        boxes = zip(r['left'].tolist(), r['top'].tolist(), r['width'].tolist(),
+                    r['height'].tolist())
+        return self.add(path, page, zip(word_boxes.texts, boxes))
+
+    def add_word_box_file(self, word_box_file):
+        """Indeks semua dokumen dalam WordBoxFile; kembalikan jumlah halaman"""
+        count = 0
+        for source, page, word_boxes in word_box_file:
+            self.add_word_boxes(source, page, word_boxes)
+            count += 1
+        return count
+
+    def remove(self, path, page=None):
+        """Hapus dokumen (semua halaman jika page None) dari index"""
+        if page is None:
+            rows = self.conn.execute('SELECT id FROM docs WHERE path = ?', (path,)).fetchall()
+        else:
+            rows = self.conn.execute('SELECT id FROM docs WHERE path = ? AND page = ?',
+                                     (path, page)).fetchall()
+        for (doc_id,) in rows:
+            self.conn.execute('DELETE FROM postings WHERE doc_id = ?', (doc_id,))
+            self.conn.execute('DELETE FROM docs WHERE id = ?', (doc_id,))
+        self.commit()
+        return len(rows)
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def _estimate_df(self, term_id, cap=10000):
+        """Jumlah dokumen yang memuat term, dibatasi cap agar biayanya tetap kecil"""
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM postings WHERE term_id = ? LIMIT ?)',
+            (term_id, cap)).fetchone()[0]
+
+    def _candidates(self, driver, others, after, size):
+        """Dokumen (id > after) yang memuat semua term, size dokumen per langkah
+
+        Term driver (paling jarang) dipindai berurutan lewat primary key, term
+        lain dicek per dokumen; CROSS JOIN menjaga urutan join ini di SQLite.
+        """
+        joins = ''.join(f' CROSS JOIN postings p{k} ON p{k}.term_id = ? AND p{k}.doc_id = p0.doc_id'
+                        for k in range(1, len(others) + 1))
+        sql = (f'SELECT p0.doc_id FROM postings p0{joins} '
+               f'WHERE p0.term_id = ? AND p0.doc_id > ? ORDER BY p0.doc_id LIMIT ?')
+        return [doc_id for (doc_id,) in self.conn.execute(sql, (*others, driver, after, size))]
+
+    def _postings(self, term_id, doc_ids):
+        marks = ','.join('?' * len(doc_ids))
+        rows = self.conn.execute(
+            f'SELECT doc_id, positions, boxes FROM postings '
+            f'WHERE term_id = ? AND doc_id IN ({marks})', (term_id, *doc_ids))
+        result = {}
+        for doc_id, positions, boxes in rows:
+            pos = array('I')
+            pos.frombytes(positions)
+            box = array('i')
+            box.frombytes(boxes)
+            result[doc_id] = (pos, box)
+        return result
+
+    def search(self, query, phrase=False, limit=100):
+        """Cari dokumen yang memuat semua term query (atau frasa jika phrase=True)
+
+        Mengembalikan list dict (path, page, hits, boxes) dengan boxes berupa
+        box (x, y, w, h) kata yang cocok. Pencarian berhenti setelah limit
+        dokumen cocok (urutan id dokumen); hasil diurutkan berdasarkan hits.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        term_ids = [self._term_id(term, create=False) for term in terms]
+        if None in term_ids:
+            return []
+
+        # Irisan dokumen dimulai dari term paling jarang
+        unique_ids = sorted(dict.fromkeys(term_ids), key=self._estimate_df)
+        driver, others = unique_ids[0], unique_ids[1:]
+
+        matches = []
+        after = -1
+        while len(matches) < limit:
+            chunk = self._candidates(driver, others, after, 500)
+            if not chunk:
+                break
+            postings = {term_id: self._postings(term_id, chunk) for term_id in unique_ids}
+            for doc_id in chunk:
+                boxes = self._match(doc_id, term_ids, postings, phrase)
+                if boxes:
+                    matches.append((doc_id, boxes))
+            after = chunk[-1]
+
+        matches = sorted(matches[:limit], key=lambda match: -len(match[1]))
+        results = []
+        for doc_id, boxes in matches:
+            path, page = self.conn.execute('SELECT path, page FROM docs WHERE id = ?',
+                                           (doc_id,)).fetchone()
+            results.append({'path': path, 'page': page, 'hits': len(boxes), 'boxes': boxes})
+        return results
+
+    @staticmethod
+    def _match(doc_id, term_ids, postings, phrase):
+        def box_at(term_id, index):
+            box = postings[term_id][doc_id][1]
+            return tuple(box[index * 4:index * 4 + 4])
+
+        if not phrase:
+            boxes = []
+            for term_id in dict.fromkeys(term_ids):
+                positions = postings[term_id][doc_id][0]
+                boxes.extend(box_at(term_id, i) for i in range(len(positions)))
+            return boxes
+
+        # Frasa: term ke-k harus berada di posisi awal + k
+        position_maps = [
+            {pos: i for i, pos in enumerate(postings[term_id][doc_id][0])}
+            for term_id in term_ids
+        ]
+        boxes = []
+        for start in postings[term_ids[0]][doc_id][0]:
+            hit = [position_maps[k].get(start + k) for k in range(len(term_ids))]
+            if None not in hit:
+                boxes.extend(box_at(term_id, i) for term_id, i in zip(term_ids, hit))
+        return boxes
+
+    def stats(self):
+        count = lambda table: self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return {'documents': count('docs'), 'terms': count('terms'),
+                'postings': count('postings')}
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
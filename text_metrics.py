@@ -0,0 +1,131 @@
+import os
+
+
+def levenshtein_distance(s1, s2, max_distance=None):
+    """Levenshtein distance antara dua sekuens (string atau list token)
+
+    Memakai algoritma bit-parallel Myers/Hyyrö dengan integer Python sebagai
+    bit-vector, sehingga satu iterasi memproses seluruh kolom sekaligus.
+    Jika max_distance diberikan, perhitungan berhenti lebih awal dan
+    mengembalikan max_distance + 1 begitu jarak pasti melebihi batas.
+    """
+    # Pola = sekuens terpanjang (bit-vector), iterasi atas sekuens terpendek
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    m, n = len(s1), len(s2)
+
+    if max_distance is not None and m - n > max_distance:
+        return max_distance + 1
+    if n == 0:
+        return m
+
+    peq = {}
+    for i, symbol in enumerate(s1):
+        peq[symbol] = peq.get(symbol, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+
+    for j, symbol in enumerate(s2):
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        # Setiap langkah skor berubah paling banyak 1
+        if max_distance is not None and score - (n - j - 1) > max_distance:
+            return max_distance + 1
+
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+
+    return score
+
+
+def normalize_text(text):
+    """Normalisasi teks sebelum dibandingkan"""
+    return (text or '').lower().strip()
+
+
+def character_error_rate(extracted, ground_truth):
+    """CER = edit distance karakter / panjang ground truth"""
+    if not ground_truth:
+        return 0.0 if not extracted else 1.0
+    return levenshtein_distance(extracted, ground_truth) / len(ground_truth)
+
+
+def word_error_rate(extracted, ground_truth):
+    """WER = edit distance kata (berbasis alignment) / jumlah kata ground truth"""
+    extracted_words = extracted.split()
+    ground_words = ground_truth.split()
+    if not ground_words:
+        return 0.0 if not extracted_words else 1.0
+    return levenshtein_distance(extracted_words, ground_words) / len(ground_words)
+
+
+def accuracy_metrics(extracted_text, ground_truth):
+    """Hitung semua metrik akurasi (dalam persen) untuk satu pasangan"""
+    if not extracted_text or not ground_truth:
+        return {
+            'character_accuracy': 0.0,
+            'word_accuracy': 0.0,
+            'similarity_score': 0.0,
+            'average_accuracy': 0.0,
+            'cer': 100.0,
+            'wer': 100.0
+        }
+
+    extracted = normalize_text(extracted_text)
+    ground = normalize_text(ground_truth)
+
+    # Character accuracy dari alignment (CER), bukan perbandingan posisi
+    distance = levenshtein_distance(extracted, ground)
+    cer = distance / len(ground) if ground else 1.0
+    char_accuracy = max(0.0, 1.0 - cer) * 100
+
+    # Word accuracy dari alignment kata (WER), kata berulang ikut dihitung
+    wer = word_error_rate(extracted, ground)
+    word_accuracy = max(0.0, 1.0 - wer) * 100
+
+    # Similarity dari distance yang sama
+    max_len = max(len(extracted), len(ground))
+    similarity = ((max_len - distance) / max_len) * 100 if max_len > 0 else 0
+
+    return {
+        'character_accuracy': round(char_accuracy, 2),
+        'word_accuracy': round(word_accuracy, 2),
+        'similarity_score': round(similarity, 2),
+        'average_accuracy': round((char_accuracy + word_accuracy + similarity) / 3, 2),
+        'cer': round(cer * 100, 2),
+        'wer': round(wer * 100, 2)
+    }
+
+
+def _score_pair(pair):
+    return accuracy_metrics(*pair)
+
+
+def score_pairs(pairs, workers=1):
+    """Hitung metrik untuk banyak pasangan (extracted, ground_truth) sekaligus
+
+    workers > 1 (atau None = semua core) membagi pasangan ke process pool.
+    """
+    pairs = list(pairs)
+    if workers == 1 or len(pairs) < 2:
+        return [accuracy_metrics(extracted, truth) for extracted, truth in pairs]
+
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(pairs) // ((workers or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_score_pair, pairs, chunksize=chunksize))
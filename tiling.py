@@ -0,0 +1,182 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_result import OCRResult, WORD_LEVEL
+from batch_engine import bounded_map
+
+TSV_COLUMNS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+               'left', 'top', 'width', 'height', 'conf', 'text')
+
+# Cukup untuk kata panjang (~15 huruf) pada 300 DPI; kata yang lebih lebar
+# tetap diambil dari potongan terbaiknya (lihat merge_tile_results)
+DEFAULT_OVERLAP = 320
+
+
+def default_overlap(tile_size):
+    """DEFAULT_OVERLAP, dibatasi seperempat tile untuk tile kecil"""
+    return min(DEFAULT_OVERLAP, tile_size // 4)
+
+
+def _spans(length, tile_size, overlap):
+    """Posisi awal tile di satu sumbu; tile terakhir menempel ke tepi"""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def make_tiles(shape, tile_size=2048, overlap=None):
+    """Bagi gambar (h, w) menjadi tile (x, y, w, h) yang saling tumpang tindih
+
+    overlap (piksel) sebaiknya lebih besar dari tinggi baris dan lebar
+    kata terpanjang agar setiap kata utuh di minimal satu tile; None
+    memakai default_overlap(tile_size).
+    """
+    if overlap is None:
+        overlap = default_overlap(tile_size)
+    if overlap >= tile_size:
+        raise ValueError("overlap harus lebih kecil dari tile_size")
+    (h, w) = shape[:2]
+    return [
+        (x, y, min(tile_size, w - x), min(tile_size, h - y))
+        for y in _spans(h, tile_size, overlap)
+        for x in _spans(w, tile_size, overlap)
+    ]
+
+
+def _touches_inner_edge(word, tile, shape, margin=2):
+    """True jika kata menyentuh tepi tile yang bukan tepi gambar (kemungkinan terpotong)"""
+    (x, y, w, h) = tile
+    (img_h, img_w) = shape[:2]
+    left, top = word['left'], word['top']
+    right, bottom = left + word['width'], top + word['height']
+    return ((x > 0 and left <= x + margin) or
+            (y > 0 and top <= y + margin) or
+            (x + w < img_w and right >= x + w - margin) or
+            (y + h < img_h and bottom >= y + h - margin))
+
+
+def _overlap_ratio(a, b):
+    """Luas irisan dibagi luas box yang lebih kecil"""
+    ix = min(a['left'] + a['width'], b['left'] + b['width']) - max(a['left'], b['left'])
+    iy = min(a['top'] + a['height'], b['top'] + b['height']) - max(a['top'], b['top'])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    smaller = min(a['width'] * a['height'], b['width'] * b['height'])
+    return ix * iy / smaller if smaller else 0.0
+
+
+def dedupe_words(words, threshold=0.5, cell=64):
+    """Hapus kata ganda dari area overlap; simpan yang confidence-nya tertinggi
+
+    Kata bertanda 'clipped' (menyentuh tepi dalam tile) hanya disimpan jika
+    tidak ada salinan utuh yang bertumpuk dengannya. Kata disimpan dalam
+    grid baris setinggi cell piksel sehingga setiap kata hanya dibandingkan
+    dengan kata di baris-baris sekitarnya.
+    """
+    kept = []
+    grid = {}
+    reach = 1
+    for word in sorted(words, key=lambda w: (w.get('clipped', False), -w['confidence'])):
+        row = word['top'] // cell
+        reach = max(reach, word['height'] // cell + 1)
+        if any(_overlap_ratio(word, other) > threshold
+               for r in range(row - reach, row + reach + 1)
+               for other in grid.get(r, ())):
+            continue
+        kept.append(word)
+        grid.setdefault(row, []).append(word)
+    return kept
+
+
+def reading_order(words, paragraph_gap=1.5):
+    """Kelompokkan kata global menjadi baris dan paragraf
+
+    Kata masuk ke baris yang sama jika rentang vertikalnya saling
+    tumpang tindih lebih dari separuh tinggi kata; baris diurutkan dari
+    atas ke bawah dan kata dari kiri ke kanan. Jarak antar baris lebih dari
+    paragraph_gap kali median tinggi baris memulai paragraf baru.
+    """
+    lines = []
+    for word in sorted(words, key=lambda w: w['top'] + w['height'] / 2):
+        center = word['top'] + word['height'] / 2
+        line = lines[-1] if lines else None
+        if line is not None and line['top'] <= center <= line['bottom']:
+            line['words'].append(word)
+            line['top'] = min(line['top'], word['top'])
+            line['bottom'] = max(line['bottom'], word['top'] + word['height'])
+        else:
+            lines.append({'top': word['top'], 'bottom': word['top'] + word['height'],
+                          'words': [word]})
+
+    if not lines:
+        return []
+    heights = sorted(line['bottom'] - line['top'] for line in lines)
+    median_height = heights[len(heights) // 2]
+
+    paragraphs = [[lines[0]]]
+    for previous, line in zip(lines, lines[1:]):
+        if line['top'] - previous['bottom'] > paragraph_gap * median_height:
+            paragraphs.append([])
+        paragraphs[-1].append(line)
+
+    return [[sorted(line['words'], key=lambda w: w['left']) for line in paragraph]
+            for paragraph in paragraphs]
+
+
+def merge_tile_results(tile_results, shape, lang='eng', meta=None):
+    """Gabungkan OCRResult per tile menjadi satu OCRResult dalam koordinat global
+
+    Kata yang menyentuh tepi dalam tile (mungkin terpotong) dipakai hanya
+    jika tidak ada tile yang memuatnya utuh, mis. kata yang lebih lebar dari
+    overlap; salinan dengan confidence tertinggi yang disimpan.
+    """
+    words = []
+    for tile, result in tile_results:
+        (x, y, _, _) = tile
+        for word in result.words:
+            word = dict(word, left=word['left'] + x, top=word['top'] + y)
+            word['clipped'] = _touches_inner_edge(word, tile, shape)
+            words.append(word)
+
+    data = {column: [] for column in TSV_COLUMNS}
+    for par_num, paragraph in enumerate(reading_order(dedupe_words(words)), start=1):
+        for line_num, line in enumerate(paragraph, start=1):
+            for word_num, word in enumerate(line, start=1):
+                row = (WORD_LEVEL, 1, par_num, 1, line_num, word_num,
+                       word['left'], word['top'], word['width'], word['height'],
+                       word['confidence'], word['text'])
+                for column, value in zip(TSV_COLUMNS, row):
+                    data[column].append(value)
+    return OCRResult(data, lang=lang, meta=meta)
+
+
+def recognize_tiled(app, image, lang='eng', tile_size=2048, overlap=None, workers=None):
+    """OCR gambar besar (sudah dipreprocess) per tile secara paralel
+
+    Tile berupa view numpy (tanpa salinan); setiap tile dijalankan di
+    thread terpisah karena Tesseract berjalan di subprocess/library
+    yang melepas GIL.
+    """
+    if overlap is None:
+        overlap = default_overlap(tile_size)
+    tiles = make_tiles(image.shape, tile_size, overlap)
+    meta = {'tiles': len(tiles), 'tile_size': tile_size, 'overlap': overlap}
+    if len(tiles) == 1:
+        result = app._recognize_image(image, lang=lang, preprocess=False)
+        result.meta.update(meta)
+        return result
+
+    def ocr_tile(tile):
+        (x, y, w, h) = tile
+        return tile, app._recognize_image(image[y:y + h, x:x + w], lang=lang, preprocess=False)
+
+    workers = workers or os.cpu_count() or 1
+    with app.metrics.timer('tiles'):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            tile_results = list(bounded_map(pool, ocr_tile, ((tile,) for tile in tiles),
+                                            max_inflight=workers * 2))
+    app.metrics.incr('tiles', len(tiles))
+    return merge_tile_results(tile_results, image.shape, lang=lang, meta=meta)
@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from batch_engine import (IMAGE_EXTENSIONS, RESULT_FIELDS, InlineExecutor, BatchStats,
+                          _init_worker, _matches, process_file)
+
+
+def file_hash(path):
+    """Hash isi file (blake2b, 20 byte) untuk membedakan perubahan isi dari 'touch'"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class WatchManifest:
+    """Manifest file yang sudah diproses: path -> mtime_ns, size, hash
+
+    Disimpan append-only sebagai JSONL (entry terakhir per path berlaku,
+    'deleted' menandai file yang hilang) dan dipadatkan saat dibuka. Path
+    yang dihapus tetap diingat (deleted) agar file yang dibuat ulang di
+    path yang sama tidak dianggap sudah diproses oleh run batch lama.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.deleted = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Baris terakhir terpotong (proses dihentikan saat menulis)
+                        continue
+                    if entry.get('deleted'):
+                        self.entries.pop(entry['path'], None)
+                        self.deleted.add(entry['path'])
+                    else:
+                        self.entries[entry['path']] = entry
+                        self.deleted.discard(entry['path'])
+        self._compact()
+        self._out = open(path, 'a', encoding='utf-8')
+
+    def _compact(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            for path in self.deleted:
+                f.write(json.dumps({'path': path, 'deleted': True}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def known(self, path):
+        """True jika path pernah dicatat watcher ini (termasuk yang sudah dihapus)"""
+        return path in self.entries or path in self.deleted
+
+    def update(self, path, mtime_ns, size, digest):
+        entry = {'path': path, 'mtime_ns': mtime_ns, 'size': size, 'hash': digest}
+        self.entries[path] = entry
+        self.deleted.discard(path)
+        self._write(entry)
+
+    def remove(self, path):
+        if self.entries.pop(path, None) is not None:
+            self.deleted.add(path)
+            self._write({'path': path, 'deleted': True})
+
+    def _write(self, entry):
+        self._out.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self._out.flush()
+        os.fsync(self._out.fileno())
+
+    def close(self):
+        if not self._out.closed:
+            self.flush()
+            self._out.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FolderWatcher:
+    """Watch folder: hanya gambar baru atau berubah yang di-OCR
+
+    Setiap poll hanya men-stat folder (mtime folder berubah saat file
+    ditambah, dihapus atau di-rename) dan file yang masih menunggu, sehingga
+    biaya saat idle sebanding dengan jumlah folder, bukan jumlah file.
+    Perubahan isi file yang ditimpa di tempat ditangkap oleh full scan
+    berkala (full_scan_interval detik, 0 = nonaktif).
+
+    File baru baru diproses setelah ukuran dan mtime-nya stabil selama
+    settle detik (debounce file yang masih ditulis). File yang mtime/size
+    berubah tetapi hash isinya sama tidak di-OCR ulang. Hasil ditambahkan
+    ke output yang sudah ada; untuk file yang berubah, baris terakhir per
+    path adalah versi terbaru ('merge' menyimpan baris terakhir tersebut).
+    File yang diubah atau dihapus juga diperbarui/dihapus dari index teks.
+    """
+
+    def __init__(self, app, folder, output_path, lang='eng', workers=None,
+                 interval=2.0, settle=2.0, recursive=False, include=None, exclude=None,
+                 full_scan_interval=300, boxes_path=None, index_path=None,
+                 dedup_threshold=None, manifest_path=None):
+        self.app = app
+        self.folder = folder
+        self.output_path = output_path
+        self.lang = lang
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.settle = settle
+        self.recursive = recursive
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.full_scan_interval = full_scan_interval
+        self.boxes_path = boxes_path
+        self.index_path = index_path
+        self.dedup_threshold = dedup_threshold
+        self.manifest_path = manifest_path or output_path + '.watch'
+
+        self._dirs = {}          # folder -> mtime_ns saat terakhir di-list
+        self._pending = {}       # path -> (mtime_ns, size, waktu terakhir berubah)
+        self._queue = deque()    # path siap diproses, menunggu slot worker
+        self._inflight = {}      # future -> (path, mtime_ns, size, hash)
+        self._busy = set()       # path di antrian atau sedang diproses
+        self._batch_done = set() # path yang sudah selesai oleh run batch sebelumnya
+        self._batch_mtime_ns = 0 # mtime manifest batch saat watcher dimulai
+        self._index = None
+        self._last_full_scan = 0.0
+        self.stats = BatchStats()
+        self.skipped = 0
+
+    # --- Deteksi perubahan -------------------------------------------------
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.folder).replace(os.sep, '/')
+
+    def _list_dir(self, folder):
+        """List satu folder: catat mtime-nya, jadwalkan subfolder dan file gambar"""
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            self._dirs.pop(folder, None)
+            return
+        # Folder yang baru berubah di-list lagi pada poll berikutnya: perubahan
+        # dalam tick mtime yang sama (filesystem resolusi kasar) tidak terlewat
+        recent = time.time_ns() - mtime_ns < 2 * 10 ** 9
+        self._dirs[folder] = -1 if recent else mtime_ns
+
+        for entry in entries:
+            rel_path = self._rel(entry.path)
+            if entry.is_dir(follow_symlinks=False):
+                if (self.recursive and entry.path not in self._dirs
+                        and not _matches(rel_path, self.exclude)):
+                    self._list_dir(entry.path)
+                continue
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if self.include and not _matches(rel_path, self.include):
+                continue
+            if _matches(rel_path, self.exclude):
+                continue
+            self._check_file(entry.path)
+
+    def _check_file(self, path):
+        """Jadwalkan file jika belum tercatat atau stat-nya berbeda dari manifest"""
+        if path in self._pending or path in self._busy:
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        entry = self.manifest.get(path)
+        if path in self._batch_done:
+            self._batch_done.discard(path)
+            if (not self.manifest.known(path)
+                    and st.st_mtime_ns <= self._batch_mtime_ns):
+                # Sudah diproses 'batch' ke output yang sama dan tidak berubah
+                # sesudahnya: catat tanpa OCR ulang
+                self.manifest.update(path, st.st_mtime_ns, st.st_size, None)
+                return
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return
+        self._pending[path] = (st.st_mtime_ns, st.st_size, time.monotonic())
+
+    def load_batch_manifest(self, manifest_path):
+        """Path yang sudah selesai oleh run 'batch' ke output yang sama
+
+        Hanya dipakai untuk path yang belum pernah dicatat watcher ini dan
+        tidak diubah setelah manifest batch terakhir ditulis.
+        """
+        from result_writer import read_manifest
+        self._batch_done = read_manifest(manifest_path)
+        try:
+            self._batch_mtime_ns = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            self._batch_mtime_ns = 0
+
+    def scan(self, full=False):
+        """Satu poll: list ulang folder yang berubah (semua folder jika full)"""
+        if full or not self._dirs:
+            self._dirs.clear()
+            self._list_dir(self.folder)
+            self._last_full_scan = time.monotonic()
+            self._forget_missing()
+            return
+        for folder, mtime_ns in list(self._dirs.items()):
+            try:
+                changed = os.stat(folder).st_mtime_ns != mtime_ns
+            except OSError:
+                self._dirs.pop(folder, None)
+                continue
+            if changed:
+                self._list_dir(folder)
+
+    def _forget_missing(self):
+        """Hapus entry manifest dan index untuk file yang sudah tidak ada (full scan saja)"""
+        for path in list(self.manifest.entries):
+            if not os.path.exists(path):
+                if self._index is not None:
+                    self._index.remove(path)
+                self.manifest.remove(path)
+
+    def _settle_pending(self):
+        """Pindahkan file yang ukuran/mtime-nya stabil selama settle detik ke antrian"""
+        now = time.monotonic()
+        for path, (mtime_ns, size, changed_at) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                self._pending[path] = (st.st_mtime_ns, st.st_size, now)
+            elif size > 0 and now - changed_at >= self.settle:
+                del self._pending[path]
+                self._enqueue(path, mtime_ns, size)
+
+    def _enqueue(self, path, mtime_ns, size):
+        try:
+            digest = file_hash(path)
+        except OSError:
+            return
+        entry = self.manifest.get(path)
+        if entry and entry.get('hash') == digest:
+            # Hanya mtime yang berubah (mis. disalin ulang): tidak perlu OCR
+            self.manifest.update(path, mtime_ns, size, digest)
+            self.skipped += 1
+            return
+        self._queue.append((path, mtime_ns, size, digest))
+        self._busy.add(path)
+
+    # --- Pemrosesan ---------------------------------------------------------
+
+    def _submit(self, pool, preprocess, with_boxes):
+        # Worker proses memakai app miliknya sendiri (_init_worker)
+        app = self.app if self.workers == 1 else None
+        while self._queue and len(self._inflight) < self.workers * 2:
+            job = self._queue.popleft()
+            args = (process_file, job[0], self.lang, app, preprocess, with_boxes)
+            if self.dedup_threshold is not None and self.manifest.get(job[0]):
+                # File yang diubah tidak boleh cocok dengan hasil versi lamanya
+                future = pool.submit(*args, lookup=False)
+            else:
+                future = pool.submit(*args)
+            self._inflight[future] = job
+
+    def _collect(self, timeout, writer, boxes, index):
+        """Tunggu hasil sampai timeout detik, tulis yang selesai lalu catat di manifest"""
+        if not self._inflight:
+            time.sleep(timeout)
+            return
+        done, _ = wait(self._inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            return
+        jobs = []
+        for future in done:
+            job = self._inflight.pop(future)
+            self._busy.discard(job[0])
+            records = future.result()
+            self.app.metrics.merge(records[0].pop('_metrics', None))
+            if index is not None and self.manifest.get(job[0]):
+                # Versi lama bisa punya halaman lebih banyak dari versi baru
+                index.remove(job[0])
+            self.app._write_records(records, writer, self.stats, boxes, index)
+            jobs.append(job)
+        # Manifest dicatat setelah hasil aman di output
+        writer.flush()
+        for path, mtime_ns, size, digest in jobs:
+            self.manifest.update(path, mtime_ns, size, digest)
+        self.manifest.flush()
+
+    @property
+    def idle(self):
+        return not (self._pending or self._queue or self._inflight)
+
+    def run(self, once=False, preprocess=True):
+        """Jalankan watch loop sampai Ctrl+C (atau sampai semua file selesai jika once)"""
+        from result_writer import StreamingResultWriter
+
+        self.manifest = WatchManifest(self.manifest_path)
+        print(f"Watching {self.folder} ({len(self.manifest)} files already processed)")
+
+        boxes = None
+        if self.boxes_path:
+            from word_boxes import WordBoxWriter, next_part_path, recover_parts
+            for part, count in recover_parts(self.boxes_path).items():
+                print(f"Recovered {count} pages of word boxes in {part}")
+            self.boxes_path = next_part_path(self.boxes_path)
+            boxes = WordBoxWriter(self.boxes_path)
+        index = None
+        if self.index_path:
+            from text_index import TextIndex
+            index = self._index = TextIndex(self.index_path)
+
+        if self.workers == 1:
+            pool = InlineExecutor()
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(self.app,))
+        executor = pool
+        if self.dedup_threshold is not None:
+            from batch_engine import DedupExecutor, HASH_WORKERS
+            from dedup import Deduplicator
+            executor = DedupExecutor(pool, Deduplicator(self.dedup_threshold),
+                                     hash_workers=min(self.workers, HASH_WORKERS)
+                                     if self.workers > 1 else 0)
+
+        writer = StreamingResultWriter(self.output_path, RESULT_FIELDS, chunk_size=100,
+                                       resume=True)
+        if boxes is not None:
+            writer.checkpoint_hooks.append(boxes.checkpoint)
+        if index is not None:
+            writer.checkpoint_hooks.append(index.commit)
+        self.load_batch_manifest(writer.manifest_path)
+        try:
+            self.scan(full=True)
+            while True:
+                full = (self.full_scan_interval and
+                        time.monotonic() - self._last_full_scan >= self.full_scan_interval)
+                self.scan(full=bool(full))
+                self._settle_pending()
+                self._submit(executor, preprocess, bool(boxes or index))
+                if once and self.idle:
+                    break
+                self._collect(self.interval if not self._queue else 0.05,
+                              writer, boxes, index)
+        except KeyboardInterrupt:
+            print("Stopping watch...")
+        finally:
+            for future in self._inflight:
+                future.cancel()
+            if executor is not pool:
+                executor.shutdown()
+            if isinstance(pool, ProcessPoolExecutor):
+                pool.shutdown(wait=True, cancel_futures=True)
+            writer.close()
+            self.manifest.close()
+            if boxes is not None:
+                boxes.close()
+                if boxes.documents:
+                    print(f"Word boxes saved to {self.boxes_path}")
+            if index is not None:
+                index.close()
+
+        print(self.stats)
+        if self.skipped:
+            print(f"{self.skipped} files unchanged (same content), not re-processed")
+        print(f"Results appended to {self.output_path}")
+        return self.stats.as_dict()
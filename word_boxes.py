@@ -0,0 +1,424 @@
+import os
+import json
+import struct
+import numpy as np
+
+from ocr_result import WORD_LEVEL
+
+# Satu record per kata; teks disimpan terpisah dalam satu blob UTF-8
+WORD_DTYPE = np.dtype([
+    ('left', '<i4'),
+    ('top', '<i4'),
+    ('width', '<i4'),
+    ('height', '<i4'),
+    ('conf', '<f4'),
+    ('doc', '<u4'),
+    ('page', '<u2'),
+    ('block', '<u2'),
+    ('par', '<u2'),
+    ('line', '<u2'),
+    ('word', '<u2'),
+    ('text_len', '<u2'),
+    ('text_offset', '<u8'),
+])
+
+MAGIC = b'OCRWBX1\n'
+_TRAILER = struct.Struct('<Q8s')
+_ALIGN = 64
+
+
+class WordBoxes:
+    """Kumpulan kata OCR dalam bentuk kolom (numpy structured array)
+
+    records berisi box, confidence dan struktur per kata; teks semua kata
+    disimpan dalam satu blob UTF-8 (text_offset/text_len per record).
+    Subset (filter, slice) berbagi blob yang sama tanpa salinan teks.
+    transform (affine 2x3, opsional) memetakan gambar sebelum preprocessing
+    ke frame koordinat box (deskew/crop, lihat preprocessing.record_transform).
+    """
+
+    __slots__ = ('records', 'blob', 'transform')
+
+    def __init__(self, records, blob, transform=None):
+        self.records = records
+        self.blob = blob
+        self.transform = transform
+
+    @classmethod
+    def from_data(cls, data, transform=None):
+        """Bangun dari dict kolom TSV (tesseract_engine.parse_tsv)"""
+        texts = data['text']
+        keep = [i for i in range(len(texts))
+                if data['level'][i] == WORD_LEVEL and texts[i].strip()]
+        index = np.asarray(keep, dtype=np.intp)
+        records = np.zeros(len(keep), dtype=WORD_DTYPE)
+        for field, column in (('left', 'left'), ('top', 'top'), ('width', 'width'),
+                              ('height', 'height'), ('conf', 'conf'), ('page', 'page_num'),
+                              ('block', 'block_num'), ('par', 'par_num'),
+                              ('line', 'line_num'), ('word', 'word_num')):
+            if len(keep):
+                records[field] = np.asarray(data[column])[index]
+
+        encoded = [texts[i].encode('utf-8') for i in keep]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.uint64, count=len(encoded))
+        records['text_len'] = lengths
+        if len(encoded):
+            records['text_offset'][1:] = np.cumsum(lengths)[:-1]
+        return cls(records, np.frombuffer(b''.join(encoded), dtype=np.uint8), transform)
+
+    @classmethod
+    def from_result(cls, result):
+        return cls.from_data(result.data, result.meta.get('transform'))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        """Index int memberi dict satu kata; slice/mask/array index memberi WordBoxes"""
+        if isinstance(index, (int, np.integer)):
+            record = self.records[index]
+            return {
+                'text': self.text(index),
+                'confidence': float(record['conf']),
+                'left': int(record['left']),
+                'top': int(record['top']),
+                'width': int(record['width']),
+                'height': int(record['height']),
+                'page': int(record['page']),
+                'block': int(record['block']),
+                'par': int(record['par']),
+                'line': int(record['line']),
+                'word': int(record['word'])
+            }
+        return WordBoxes(self.records[index], self.blob, self.transform)
+
+    def text(self, index):
+        record = self.records[index]
+        start = int(record['text_offset'])
+        return bytes(self.blob[start:start + int(record['text_len'])]).decode('utf-8')
+
+    @property
+    def texts(self):
+        return [self.text(i) for i in range(len(self.records))]
+
+    @property
+    def confidences(self):
+        return self.records['conf']
+
+    @property
+    def boxes(self):
+        """Array (n, 4) berisi x, y, w, h"""
+        r = self.records
+        return np.stack([r['left'], r['top'], r['width'], r['height']], axis=1)
+
+    @property
+    def mean_confidence(self):
+        conf = self.records['conf']
+        conf = conf[conf >= 0]
+        return float(conf.mean()) if conf.size else 0.0
+
+    def mask(self, min_confidence=None, region=None, contained=False, page=None):
+        """Mask boolean vektor: confidence > min_confidence, box beririsan
+        dengan (atau berada di dalam, contained=True) region (x, y, w, h)"""
+        r = self.records
+        keep = np.ones(len(r), dtype=bool)
+        if min_confidence is not None:
+            keep &= r['conf'] > min_confidence
+        if page is not None:
+            keep &= r['page'] == page
+        if region is not None:
+            (x, y, w, h) = region
+            right = r['left'] + r['width']
+            bottom = r['top'] + r['height']
+            if contained:
+                keep &= (r['left'] >= x) & (r['top'] >= y) & (right <= x + w) & (bottom <= y + h)
+            else:
+                keep &= (r['left'] < x + w) & (right > x) & (r['top'] < y + h) & (bottom > y)
+        return keep
+
+    def filter(self, min_confidence=None, region=None, contained=False, page=None):
+        """Subset kata sesuai kriteria mask()"""
+        return self[self.mask(min_confidence, region, contained, page)]
+
+    def word_details(self):
+        """Format lama extract_with_details: text, confidence, position"""
+        r = self.records
+        return [
+            {
+                'text': text,
+                'confidence': int(conf),
+                'position': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)}
+            }
+            for text, conf, x, y, w, h in zip(self.texts, r['conf'], r['left'], r['top'],
+                                              r['width'], r['height'])
+        ]
+
+    def save(self, path, source=''):
+        """Simpan sebagai file kolom biner satu dokumen (lihat WordBoxWriter)"""
+        with WordBoxWriter(path) as writer:
+            writer.add(self, source)
+
+
+def next_part_path(path):
+    """Path belum terpakai: path, atau name.part1.wbx, name.part2.wbx, ..."""
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    number = 1
+    while os.path.exists(f"{stem}.part{number}{ext}"):
+        number += 1
+    return f"{stem}.part{number}{ext}"
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % _ALIGN))
+
+
+def _write_footer(f, count, records_offset, text_offset, text_size, documents):
+    footer = json.dumps({
+        'dtype': WORD_DTYPE.descr,
+        'count': count,
+        'records_offset': records_offset,
+        'text_offset': text_offset,
+        'text_size': text_size,
+        'documents': documents
+    }).encode('utf-8')
+    f.write(footer)
+    f.write(_TRAILER.pack(len(footer), MAGIC))
+
+
+def _copy(src, dst, size=None):
+    """Salin isi file src (sampai size byte) ke posisi dst sekarang"""
+    remaining = size
+    while remaining is None or remaining > 0:
+        chunk = src.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+def _sidecars(path):
+    """(file blob teks, file checkpoint) milik writer yang sedang menulis path"""
+    return path + '.text', path + '.checkpoint'
+
+
+class WordBoxWriter:
+    """Tulis WordBoxes banyak dokumen ke satu file kolom biner (.wbx) secara streaming
+
+    Layout: MAGIC, records (WORD_DTYPE, berurutan), blob teks, footer JSON
+    (dtype, offset, daftar dokumen [source, page, awal, akhir, transform]),
+    lalu trailer (panjang footer, MAGIC).
+    Records ditulis langsung ke file, blob teks ke file samping (.text) yang
+    disalin ke belakang saat close(), sehingga memori tetap konstan.
+
+    checkpoint() mem-fsync keduanya dan mencatat dokumen yang sudah aman di
+    file .checkpoint (append-only); jika proses berhenti sebelum close(),
+    recover() menyusun file yang terbaca dari checkpoint terakhir.
+    File baru dibuat saat add() pertama; writer yang tidak pernah menerima
+    dokumen tidak meninggalkan file apa pun.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.documents = []
+        self.count = 0
+        self._text_size = 0
+        self._checkpointed = 0
+        self._out = None
+
+    def _open(self):
+        self._out = open(self.path, 'wb')
+        self._out.write(MAGIC)
+        _pad(self._out)
+        self._records_offset = self._out.tell()
+        (self._blob_path, self._checkpoint_path) = _sidecars(self.path)
+        self._blob = open(self._blob_path, 'w+b')
+        self._checkpoint = open(self._checkpoint_path, 'w', encoding='utf-8')
+
+    def add(self, boxes, source='', page=1):
+        """Tambahkan kata satu dokumen/halaman; kembalikan nomor dokumen"""
+        if self._out is None:
+            self._open()
+        doc = len(self.documents)
+        records = boxes.records.copy()
+        records['doc'] = doc
+
+        # Blob dipadatkan ulang agar subset tidak menyeret teks kata lain
+        starts = records['text_offset'].astype(np.int64)
+        lengths = records['text_len'].astype(np.int64)
+        text = b''.join(bytes(boxes.blob[s:s + n]) for s, n in zip(starts, lengths))
+        offsets = np.zeros(len(records), dtype=np.uint64)
+        if len(records):
+            offsets[1:] = np.cumsum(lengths[:-1])
+        records['text_offset'] = offsets + self._text_size
+
+        self._out.write(records.tobytes())
+        self._blob.write(text)
+        self.documents.append([source, page, self.count, self.count + len(records),
+                               boxes.transform])
+        self.count += len(records)
+        self._text_size += len(text)
+        return doc
+
+    def checkpoint(self):
+        """Pastikan dokumen yang sudah ditambahkan bisa dipulihkan setelah crash"""
+        if self._checkpointed == len(self.documents):
+            return
+        for f in (self._out, self._blob):
+            f.flush()
+            os.fsync(f.fileno())
+        entry = {
+            'records_offset': self._records_offset,
+            'count': self.count,
+            'text_size': self._text_size,
+            'documents': self.documents[self._checkpointed:]
+        }
+        self._checkpoint.write(json.dumps(entry) + '\n')
+        self._checkpoint.flush()
+        os.fsync(self._checkpoint.fileno())
+        self._checkpointed = len(self.documents)
+
+    def close(self):
+        if self._out is None or self._out.closed:
+            return
+        _pad(self._out)
+        text_offset = self._out.tell()
+        self._blob.seek(0)
+        _copy(self._blob, self._out)
+        self._blob.close()
+        _write_footer(self._out, self.count, self._records_offset, text_offset,
+                      self._text_size, self.documents)
+        self._out.close()
+        self._checkpoint.close()
+        for path in (self._blob_path, self._checkpoint_path):
+            os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def is_complete(path):
+    """True jika file .wbx ditutup dengan benar (trailer utuh)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < len(MAGIC) + _TRAILER.size:
+                return False
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            return _TRAILER.unpack(f.read(_TRAILER.size))[1] == MAGIC
+    except OSError:
+        return False
+
+
+def recover(path):
+    """Pulihkan file .wbx yang writer-nya berhenti sebelum close()
+
+    Records dipotong sampai checkpoint terakhir, blob teks dari file .text
+    disalin ke belakang lalu footer ditulis. Dokumen setelah checkpoint
+    terakhir hilang (manifest batch juga belum mencatatnya, sehingga file
+    tersebut diproses ulang). Mengembalikan jumlah dokumen yang dipulihkan.
+    """
+    (blob_path, checkpoint_path) = _sidecars(path)
+    entry = {'records_offset': _ALIGN, 'count': 0, 'text_size': 0}
+    documents = []
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Baris terakhir terpotong
+                    break
+                documents.extend(entry['documents'])
+
+    with open(path, 'r+b') as out:
+        out.truncate(entry['records_offset'] + entry['count'] * WORD_DTYPE.itemsize)
+        out.seek(0, os.SEEK_END)
+        _pad(out)
+        text_offset = out.tell()
+        if entry['text_size']:
+            with open(blob_path, 'rb') as blob:
+                _copy(blob, out, entry['text_size'])
+        _write_footer(out, entry['count'], entry['records_offset'], text_offset,
+                      entry['text_size'], documents)
+    for sidecar in (blob_path, checkpoint_path):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+    return len(documents)
+
+
+def part_paths(path):
+    """path dan file part-nya (name.part1.wbx, ...) yang sudah ada"""
+    stem, ext = os.path.splitext(path)
+    paths = [path] if os.path.exists(path) else []
+    number = 1
+    while os.path.exists(f"{stem}.part{number}{ext}"):
+        paths.append(f"{stem}.part{number}{ext}")
+        number += 1
+    return paths
+
+
+def recover_parts(path):
+    """Pulihkan semua part path yang belum lengkap; kembalikan {part: jumlah dokumen}"""
+    return {part: recover(part) for part in part_paths(path) if not is_complete(part)}
+
+
+class WordBoxFile:
+    """Baca file .wbx dengan np.memmap (tanpa parsing teks, tanpa memuat semua data)"""
+
+    def __init__(self, path):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            f.seek(size - _TRAILER.size)
+            footer_len, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Bukan file word box: {path}")
+            f.seek(size - _TRAILER.size - footer_len)
+            footer = json.loads(f.read(footer_len))
+
+        dtype = np.dtype([tuple(field) for field in footer['dtype']])
+        self.count = footer['count']
+        self.documents = footer['documents']
+        if self.count:
+            self.records = np.memmap(path, dtype=dtype, mode='r',
+                                     offset=footer['records_offset'], shape=(self.count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+        if footer['text_size']:
+            self.blob = np.memmap(path, dtype=np.uint8, mode='r',
+                                  offset=footer['text_offset'], shape=(footer['text_size'],))
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+        self._index = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def all(self):
+        """Semua kata dari semua dokumen (kolom doc menunjuk ke documents)"""
+        return WordBoxes(self.records, self.blob)
+
+    def document(self, doc):
+        """(source, page, WordBoxes) untuk dokumen ke-doc"""
+        source, page, start, end = self.documents[doc][:4]
+        # File lama tidak menyimpan transform
+        transform = self.documents[doc][4] if len(self.documents[doc]) > 4 else None
+        return source, page, WordBoxes(self.records[start:end], self.blob, transform)
+
+    def find(self, source, page=1):
+        """WordBoxes untuk (source, page), None jika tidak ada"""
+        if self._index is None:
+            self._index = {(d[0], d[1]): i for i, d in enumerate(self.documents)}
+        doc = self._index.get((source, page))
+        return None if doc is None else self.document(doc)[2]
+
+    def __iter__(self):
+        for doc in range(len(self.documents)):
+            yield self.document(doc)